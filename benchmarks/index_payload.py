@@ -0,0 +1,83 @@
+"""
+Measures the size and latency of the index page for the full episode list.
+
+    python benchmarks/index_payload.py [iterations]
+"""
+
+# standard library full imports
+import os
+import statistics
+import sys
+import time
+
+# standard library partial imports
+from typing import Any, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# local partial imports
+from main import app, brotli, get_catalog
+
+def measure(client: Any, url: str, accept_encoding: Union[str, None], iterations: int) -> tuple[int, list[float]]:
+    """
+    Request a URL repeatedly and time each response.
+
+    Parameters:
+        client (Any): The flask test client
+        url (str): The URL to request
+        accept_encoding (Union[str, None]): The Accept-Encoding header to send
+        iterations (int): The number of requests to make
+    Returns:
+        tuple[int, list[float]]: The response size in bytes and each latency in milliseconds
+    """
+
+    headers: dict[str, str] = {}
+
+    if accept_encoding is not None:
+        headers['Accept-Encoding'] = accept_encoding
+
+    size: int = 0
+    latencies: list[float] = []
+
+    for _ in range(iterations):
+        start: float = time.perf_counter()
+        response: Any = client.get(url, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        size = len(response.data)
+
+    return size, latencies
+
+def main() -> None:
+    """
+    Main function
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    iterations: int = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    client: Any = app.test_client()
+
+    # render once so template compilation is not timed
+    client.get('/')
+
+    print(f"episodes: {len(get_catalog().episodes)}, iterations: {iterations}")
+    print(f"{'encoding':<10}{'bytes':>10}{'p50 ms':>10}{'p95 ms':>10}")
+
+    encodings: list[Union[str, None]] = [None, 'gzip']
+
+    if brotli is not None:
+        encodings.append('br')
+    else:
+        print("brotli is not installed, so br is not measured (pip install brotli)")
+
+    for encoding in encodings:
+        size, latencies = measure(client, '/', encoding, iterations)
+        p95: float = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{encoding or 'identity':<10}{size:>10}{statistics.median(latencies):>10.2f}{p95:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Checks that every gunicorn worker agrees on the state after a refresh.
+
+Starts gunicorn with several workers against a copy of the databases, holds
+a keep-alive connection to each worker, then saves a watchlist and publishes
+a new catalog release. Every worker must serve the new state within
+ARROWVERSE_CACHE_CHECK_INTERVAL seconds of the change.
+
+    python benchmarks/multi_worker_check.py [workers] [interval]
+"""
+
+# standard library full imports
+import http.client
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+# standard library partial imports
+from typing import Any, Callable
+
+ROOT_DIRECTORY: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT_DIRECTORY)
+
+# local full imports
+import datasetup
+
+# constants
+STARTUP_TIMEOUT: float = 60.0
+POLL_INTERVAL: float = 0.02
+CHECK_SLACK: float = 0.25
+WATCHLIST_UUID: str = "multi-worker-check"
+
+def use_directory(directory: str) -> None:
+    """
+    Copy the catalog into a directory of its own and create empty watchlists beside it.
+
+    Parameters:
+        directory (str): The directory for the databases
+    Returns:
+        None
+    """
+
+    datasetup.CATALOG_DB_FILENAME = os.path.join(directory, "catalog.db")
+    datasetup.CATALOG_BUILD_FILENAME = f"{datasetup.CATALOG_DB_FILENAME}.build"
+    datasetup.WATCHLIST_DB_FILENAME = os.path.join(directory, "watchlists.db")
+
+    shutil.copyfile(os.path.join(ROOT_DIRECTORY, "catalog.db"), datasetup.CATALOG_DB_FILENAME)
+    datasetup.create_watchlist_database()
+
+def get_free_port() -> int:
+    """
+    Find a local TCP port nothing is listening on.
+
+    Parameters:
+        None
+    Returns:
+        int: The port
+    """
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def get_json(conn: http.client.HTTPConnection, path: str) -> tuple[int, Any]:
+    """
+    Send a GET request on a keep-alive connection.
+
+    Parameters:
+        conn (http.client.HTTPConnection): The connection
+        path (str): The path
+    Returns:
+        tuple[int, Any]: The response status and decoded JSON body
+    """
+
+    conn.request("GET", path)
+    response: http.client.HTTPResponse = conn.getresponse()
+
+    return response.status, json.loads(response.read())
+
+def connect_workers(port: int, workers: int) -> dict[int, http.client.HTTPConnection]:
+    """
+    Open connections until there is a ready keep-alive connection to every worker.
+
+    A keep-alive connection stays with the worker that accepted it, so each
+    request on it is served by the same process.
+
+    Parameters:
+        port (int): The port gunicorn listens on
+        workers (int): The number of workers
+    Returns:
+        dict[int, http.client.HTTPConnection]: A connection keyed by worker pid
+    """
+
+    connections: dict[int, http.client.HTTPConnection] = {}
+    deadline: float = time.monotonic() + STARTUP_TIMEOUT
+
+    while len(connections) < workers and time.monotonic() < deadline:
+        conn: http.client.HTTPConnection = http.client.HTTPConnection("127.0.0.1", port)
+
+        try:
+            status, body = get_json(conn, "/ready")
+        except (ConnectionError, http.client.HTTPException):
+            conn.close()
+            time.sleep(0.1)
+            continue
+
+        if status != 200 or body["pid"] in connections:
+            conn.close()
+            continue
+
+        connections[body["pid"]] = conn
+
+    if len(connections) < workers:
+        raise AssertionError(f"only reached {len(connections)} of {workers} workers")
+
+    return connections
+
+def wait_for_agreement(
+    connections: dict[int, http.client.HTTPConnection],
+    path: str,
+    agrees: Callable[[Any], bool],
+    changed_at: float,
+    interval: float
+) -> dict[int, float]:
+    """
+    Poll every worker until each one serves a response that agrees with a change.
+
+    Parameters:
+        connections (dict[int, http.client.HTTPConnection]): A connection keyed by worker pid
+        path (str): The path to poll
+        agrees (Callable[[Any], bool]): Whether a response body shows the change
+        changed_at (float): The time.monotonic() the change was committed
+        interval (float): The cache check interval the workers run with
+    Returns:
+        dict[int, float]: The seconds each worker took to agree, keyed by pid
+    """
+
+    waiting: set[int] = set(connections)
+    delays: dict[int, float] = {}
+    deadline: float = changed_at + interval + CHECK_SLACK
+
+    while len(waiting) != 0 and time.monotonic() < deadline:
+        for pid in list(waiting):
+            _, body = get_json(connections[pid], path)
+
+            if agrees(body):
+                delays[pid] = time.monotonic() - changed_at
+                waiting.remove(pid)
+
+        time.sleep(POLL_INTERVAL)
+
+    if len(waiting) != 0:
+        raise AssertionError(f"workers {sorted(waiting)} did not agree within {interval + CHECK_SLACK:.2f} s")
+
+    return delays
+
+def get_next_episode_id(body: Any) -> int:
+    """
+    Get the first episode id from a /next_up response.
+
+    Parameters:
+        body (Any): The decoded /next_up response
+    Returns:
+        int: The episode id
+    """
+
+    return body["episodes"][0]["episode_id"]
+
+def run(port: int, workers: int, interval: float) -> None:
+    """
+    Change the watchlists and the catalog, and check every worker sees each change in time.
+
+    Parameters:
+        port (int): The port gunicorn listens on
+        workers (int): The number of workers
+        interval (float): The cache check interval the workers run with
+    Returns:
+        None
+    """
+
+    connections: dict[int, http.client.HTTPConnection] = connect_workers(port, workers)
+    next_up_path: str = f"/next_up?watchlist={WATCHLIST_UUID}&count=1"
+
+    # fill every worker's cache with the watchlist before changing it
+    first_ids: set[int] = {
+        get_next_episode_id(get_json(conn, next_up_path)[1])
+        for conn in connections.values()
+    }
+
+    if len(first_ids) != 1:
+        raise AssertionError(f"workers disagree before any change: {first_ids}")
+
+    episode_id: int = first_ids.pop()
+
+    saved_at: float = time.monotonic()
+
+    conn: http.client.HTTPConnection = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("POST", "/save_watchlist", body=json.dumps({
+        "watchlist_uuid": WATCHLIST_UUID,
+        "watchlist_display_name": "Multi-worker check",
+        "episode_watch_states": [{"episode_id": episode_id, "watched": 1}]
+    }), headers={"Content-Type": "application/json"})
+    conn.getresponse().read()
+    conn.close()
+
+    delays: dict[int, float] = wait_for_agreement(
+        connections,
+        next_up_path,
+        lambda body: get_next_episode_id(body) != episode_id,
+        saved_at,
+        interval
+    )
+
+    print(f"save: {workers} workers agreed, slowest after {max(delays.values()) * 1000:.0f} ms")
+
+    # publish the same catalog again as a new release
+    shutil.copyfile(datasetup.CATALOG_DB_FILENAME, datasetup.CATALOG_BUILD_FILENAME)
+    published_at: float = time.monotonic()
+    datasetup.publish_catalog_database()
+
+    with sqlite3.connect(datasetup.CATALOG_DB_FILENAME) as catalog:
+        version: str = catalog.execute("SELECT Version FROM CatalogVersion").fetchone()[0]
+
+    delays = wait_for_agreement(
+        connections,
+        "/ready",
+        lambda body: body["catalog_version"] == version,
+        published_at,
+        interval
+    )
+
+    print(f"catalog release: {workers} workers agreed, slowest after {max(delays.values()) * 1000:.0f} ms")
+
+    # the watchlist survives the new release
+    for pid, conn in connections.items():
+        if get_next_episode_id(get_json(conn, next_up_path)[1]) == episode_id:
+            raise AssertionError(f"worker {pid} lost the saved watch state after the catalog release")
+
+        conn.close()
+
+def main() -> None:
+    """
+    Main function
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    workers: int = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    interval: float = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    port: int = get_free_port()
+
+    with tempfile.TemporaryDirectory() as directory:
+        use_directory(directory)
+
+        environment: dict[str, str] = dict(
+            os.environ,
+            ARROWVERSE_CATALOG_DB=datasetup.CATALOG_DB_FILENAME,
+            ARROWVERSE_WATCHLIST_DB=datasetup.WATCHLIST_DB_FILENAME,
+            ARROWVERSE_BIND=f"127.0.0.1:{port}",
+            ARROWVERSE_WORKERS=str(workers),
+            ARROWVERSE_THREADS="4",
+            ARROWVERSE_CACHE_CHECK_INTERVAL=str(interval)
+        )
+
+        server: subprocess.Popen = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "main:app"],
+            cwd=ROOT_DIRECTORY,
+            env=environment,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+        try:
+            run(port, workers, interval)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print("all workers agree")
+
+if __name__ == "__main__":
+    main()
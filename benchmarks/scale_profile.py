@@ -0,0 +1,367 @@
+"""
+Profiles the data layer against a synthetic dataset and checks that the
+optimised paths agree with the reference implementations.
+
+Generate the dataset first with benchmarks/synthetic_data.py, then:
+
+    python benchmarks/scale_profile.py <scale> [directory] [cases]
+
+Run one scale per invocation, so the memory figures are for that scale alone.
+"""
+
+# standard library full imports
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+# standard library partial imports
+from typing import Any, Callable
+
+ROOT_DIRECTORY: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED: int = 34
+
+def use_directory(directory: str) -> None:
+    """
+    Point main.py at a synthetic dataset. Must run before main is imported.
+
+    Parameters:
+        directory (str): The directory written by synthetic_data.py
+    Returns:
+        None
+    """
+
+    os.environ["ARROWVERSE_CATALOG_DB"] = os.path.join(directory, "catalog.db")
+    os.environ["ARROWVERSE_WATCHLIST_DB"] = os.path.join(directory, "watchlists.db")
+    os.environ["ARROWVERSE_VIEWING_ORDER"] = os.path.join(directory, "viewing_order.json")
+    os.environ["ARROWVERSE_SAVE_DEBOUNCE"] = "0"
+
+def profile(name: str, function: Callable[[], Any], repeatable: bool = True) -> Any:
+    """
+    Print a function's wall time and peak traced allocation.
+
+    Tracing allocations slows Python down several times over, so a
+    repeatable function is run once untraced for its time and once traced
+    for its memory. Otherwise the single traced run gives both, and the
+    time is marked with a *.
+
+    Parameters:
+        name (str): The label to print
+        function (Callable[[], Any]): The function to run
+        repeatable (bool, optional): Whether the function can be run twice. Defaults to True.
+    Returns:
+        Any: The function's result
+    """
+
+    start: float = time.perf_counter()
+
+    if repeatable:
+        function()
+
+    elapsed: float = time.perf_counter() - start
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    result: Any = function()
+
+    if not repeatable:
+        elapsed = time.perf_counter() - start
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    marker: str = " " if repeatable else "*"
+
+    print(f"{name:<40}{elapsed * 1000:>12.1f}{marker}{peak / 1024 / 1024:>11.1f}")
+
+    return result
+
+def check(condition: bool, message: str) -> None:
+    """
+    Fail loudly when an optimised path disagrees with its reference.
+
+    Parameters:
+        condition (bool): Whether the paths agree
+        message (str): What disagreed
+    Returns:
+        None
+    """
+
+    if not condition:
+        raise AssertionError(message)
+
+def reference_next_up(main: Any, watchlist_uuid: str, count: int) -> list[int]:
+    """
+    Find the next unwatched episodes by scanning the whole viewing order.
+
+    Parameters:
+        main (Any): The main module
+        watchlist_uuid (str): The uuid of the watchlist.
+        count (int): The number of episodes to return.
+    Returns:
+        list[int]: The episode ids
+    """
+
+    watched: dict[int, int] = {
+        episode.episode_id: episode.watched
+        for episode in main.get_list_of_episodes(watchlist_uuid)
+    }
+
+    return [
+        episode_id
+        for episode_id in main.get_catalog().viewing_order
+        if watched[episode_id] != 1
+    ][:count]
+
+def reference_filter(main: Any, items: list[Any], allowed_shows: str) -> list[Any]:
+    """
+    Filter shows or episodes by short code, matching on ShowId rather than name.
+
+    Parameters:
+        main (Any): The main module
+        items (list[Any]): The shows or episodes
+        allowed_shows (str): Comma separated short codes
+    Returns:
+        list[Any]: The items of the known shows, or every item if no code is known
+    """
+
+    shownames: set[str] = {
+        main.SHOWNAME_MAP[code]
+        for code in allowed_shows.split(',')
+        if code in main.SHOWNAME_MAP
+    }
+
+    if len(shownames) == 0:
+        return items
+
+    show_ids: set[int] = {
+        show.show_id
+        for show in main.get_catalog().shows
+        if show.showname in shownames
+    }
+
+    return [item for item in items if item.show_id in show_ids]
+
+def check_viewing_order(main: Any) -> None:
+    """
+    Check the cached viewing order against the crossovers in the viewing order file.
+
+    Every episode appears once. Episodes outside a crossover keep their
+    place in air date order, and the episodes of each crossover fill the
+    places they had in air date order, in the order listed.
+
+    Parameters:
+        main (Any): The main module
+    Returns:
+        None
+    """
+
+    catalog: Any = main.get_catalog()
+    air_date_order: list[int] = [episode.episode_id for episode in catalog.episodes]
+    viewing_order: list[int] = catalog.viewing_order
+
+    check(sorted(viewing_order) == sorted(air_date_order), "viewing order is not a permutation of the episodes")
+
+    with open(main.VIEWING_ORDER_FILENAME, 'r') as f:
+        crossovers: list[Any] = json.load(f)["crossovers"]
+
+    air_date_positions: dict[int, int] = {episode_id: position for position, episode_id in enumerate(air_date_order)}
+    viewing_positions: dict[int, int] = {episode_id: position for position, episode_id in enumerate(viewing_order)}
+    in_crossover: set[int] = set()
+    reordered: int = 0
+
+    for crossover in crossovers:
+        listed: list[int] = [
+            catalog.episode_ids[(show, season, episode)]
+            for show, season, episode in crossover["episodes"]
+            if (show, season, episode) in catalog.episode_ids
+        ]
+
+        slots: list[int] = sorted(air_date_positions[episode_id] for episode_id in listed)
+
+        check(
+            [viewing_positions[episode_id] for episode_id in listed] == slots,
+            f"{crossover['name']} is not in its listed order in its air date places"
+        )
+
+        in_crossover.update(listed)
+
+        if [air_date_positions[episode_id] for episode_id in listed] != slots:
+            reordered += 1
+
+    check(
+        all(
+            viewing_positions[episode_id] == position
+            for position, episode_id in enumerate(air_date_order)
+            if episode_id not in in_crossover
+        ),
+        "an episode outside every crossover moved"
+    )
+
+    print(f"viewing order agrees with {len(crossovers)} crossovers, {reordered} of them reordered")
+
+def check_properties(main: Any, rng: random.Random, cases: int) -> None:
+    """
+    Compare each optimised path with its reference on random inputs.
+
+    Parameters:
+        main (Any): The main module
+        rng (random.Random): The random number generator
+        cases (int): The number of random cases per property
+    Returns:
+        None
+    """
+
+    catalog: Any = main.get_catalog()
+
+    with main.watchlist_connection() as conn:
+        watchlists: int = conn.execute(
+            "SELECT COUNT(*) FROM Watchlists WHERE WatchlistUUID LIKE 'synthetic-%'"
+        ).fetchone()[0]
+
+    check(
+        main.get_watchlist_episodes(None) == main.get_list_of_episodes(None),
+        "catalog cache differs from get_list_of_episodes()"
+    )
+
+    check_viewing_order(main)
+
+    codes: list[str] = list(main.SHOWNAME_MAP)
+
+    for case in range(cases):
+        watchlist_uuid: str = f"synthetic-{rng.randrange(watchlists)}"
+
+        check(
+            main.get_watchlist_episodes(watchlist_uuid) == main.get_list_of_episodes(watchlist_uuid),
+            f"get_watchlist_episodes({watchlist_uuid}) differs from get_list_of_episodes()"
+        )
+
+        count: int = rng.randrange(1, main.NEXT_UP_MAX_COUNT + 1)
+
+        check(
+            [episode.episode_id for episode in main.get_next_up(watchlist_uuid, count)]
+            == reference_next_up(main, watchlist_uuid, count),
+            f"get_next_up({watchlist_uuid}, {count}) differs from a full scan"
+        )
+
+        # known codes, possibly none, with an unknown one mixed in at random
+        allowed_shows: str = ",".join(
+            rng.sample(codes, rng.randrange(0, min(5, len(codes)) + 1))
+            + rng.choice([[], ["unknown"]])
+        )
+
+        for items in [catalog.shows, catalog.episodes]:
+            check(
+                main.filter_arrowverse_items(items, allowed_shows) == reference_filter(main, items, allowed_shows),
+                f"filter_arrowverse_items() differs from a ShowId filter for {allowed_shows!r}"
+            )
+
+        # the same range through the set-based statement and through add_episodes
+        show: Any = rng.choice(catalog.shows)
+        season: Any = rng.choice([None, 1])
+        watched: int = rng.choice([0, 1])
+
+        range_ids: list[int] = [
+            episode.episode_id
+            for episode in catalog.episodes
+            if episode.showname == show.showname and season in [None, episode.season]
+        ]
+
+        main.set_watched_range(f"range-{case}", "Range", watched, showname=show.showname, season=season)
+        main.add_episodes(f"loop-{case}", "Loop", [
+            main.EpisodeWatchState(episode_id=episode_id, watched=watched)
+            for episode_id in range_ids
+        ])
+
+        check(
+            main.get_watched_episodes(f"range-{case}") == main.get_watched_episodes(f"loop-{case}"),
+            f"set_watched_range() differs from add_episodes() for {show.showname} season {season}"
+        )
+
+        # an exported watchlist imported under a new uuid
+        records: list[Any] = list(main.iter_watchlist_records(watchlist_uuid))
+
+        for record in records:
+            record.watchlist_uuid = f"import-{case}"
+
+        if len(records) != 0:
+            main.save_watchlist_records(records, catalog)
+
+        check(
+            main.get_watched_episodes(f"import-{case}") == main.get_watched_episodes(watchlist_uuid),
+            f"export and import of {watchlist_uuid} changed its watch states"
+        )
+
+    print(f"{cases} random cases per property agree")
+
+def run(directory: str, cases: int) -> None:
+    """
+    Profile the data layer and check its properties against one dataset.
+
+    Parameters:
+        directory (str): The directory written by synthetic_data.py
+        cases (int): The number of random cases per property
+    Returns:
+        None
+    """
+
+    use_directory(directory)
+
+    sys.path.insert(0, ROOT_DIRECTORY)
+
+    print(f"{'operation':<40}{'ms':>12}{'peak MiB':>12}")
+
+    main: Any = profile("import main (loads catalog cache)", lambda: __import__("main"), repeatable=False)
+
+    catalog: Any = main.get_catalog()
+    watchlist_uuid: str = "synthetic-0"
+
+    # give every synthetic show a short code, as the real shows have
+    main.SHOWNAME_MAP.update({f"s{show.show_id}": show.showname for show in catalog.shows})
+
+    shownames: str = ",".join(list(main.SHOWNAME_MAP)[::4])
+
+    profile("get_list_of_episodes()", lambda: main.get_list_of_episodes())
+    profile("get_list_of_episodes(watchlist)", lambda: main.get_list_of_episodes(watchlist_uuid))
+    profile("get_watchlist_episodes(watchlist) cold", lambda: main.get_watchlist_episodes(watchlist_uuid), repeatable=False)
+    profile("get_watchlist_episodes(watchlist) warm", lambda: main.get_watchlist_episodes(watchlist_uuid))
+    profile("filter_arrowverse_items(episodes)", lambda: main.filter_arrowverse_items(catalog.episodes, shownames))
+    profile("get_next_up(watchlist, 10)", lambda: main.get_next_up(watchlist_uuid, 10))
+    profile("add_episodes(1000 states)", lambda: main.add_episodes("profile-loop", "Profile", [
+        main.EpisodeWatchState(episode_id=episode.episode_id, watched=1)
+        for episode in catalog.episodes[:1000]
+    ]))
+    profile("set_watched_range(everything)", lambda: main.set_watched_range("profile-range", "Profile", 1))
+    profile("export every watchlist", lambda: sum(1 for _ in main.iter_watchlist_records()))
+
+    rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{len(catalog.episodes)} episodes, max RSS {rss / 1024:.0f} MiB")
+
+    check_properties(main, random.Random(SEED), cases)
+
+def main() -> None:
+    """
+    Main function
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    if len(sys.argv) < 2:
+        print(f"usage: {sys.argv[0]} <scale> [directory] [cases]")
+        sys.exit(1)
+
+    scale_name: str = sys.argv[1]
+    directory: str = sys.argv[2] if len(sys.argv) > 2 else os.path.join("synthetic", scale_name)
+    cases: int = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    run(os.path.abspath(directory), cases)
+
+if __name__ == "__main__":
+    main()
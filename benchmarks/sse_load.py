@@ -0,0 +1,210 @@
+"""
+Load tests /watchlist_events with many concurrent Server-Sent Events clients.
+
+Start the app first, with enough streams for every client, e.g.
+
+    ARROWVERSE_WORKERS=2 ARROWVERSE_THREADS=600 gunicorn main:app
+
+Each worker holds at most ARROWVERSE_MAX_STREAMS streams, 80% of its threads
+by default. Clients past that are refused with a 503 and counted as such.
+
+then
+
+    python benchmarks/sse_load.py [base_url] [clients] [watchlists] [saves] [server_pids]
+
+server_pids is a comma separated list of the processes serving the
+clients, e.g. the gunicorn workers. When given, the CPU time they use
+while every client sits idle is reported.
+"""
+
+# standard library full imports
+import http.client
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+# standard library partial imports
+from typing import Any
+from urllib.parse import urlparse
+
+# constants
+IDLE_SECONDS: float = 5.0
+SAVE_INTERVAL: float = 0.1
+SETTLE_SECONDS: float = 3.0
+
+# received events, as (watchlist index, episode id, time received)
+received: list[tuple[int, int, float]] = []
+received_lock: threading.Lock = threading.Lock()
+# the watchlist index of every client refused for a full worker
+refused: list[int] = []
+connected: threading.Semaphore = threading.Semaphore(0)
+
+def get_cpu_seconds(pids: list[int]) -> float:
+    """
+    Get the user and system CPU time used so far by some processes.
+
+    Parameters:
+        pids (list[int]): The process ids
+    Returns:
+        float: The CPU seconds
+    """
+
+    ticks: int = 0
+
+    for pid in pids:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            fields: list[str] = f.read().rsplit(')', 1)[1].split()
+
+        # utime and stime are fields 14 and 15, counted from the pid
+        ticks += int(fields[11]) + int(fields[12])
+
+    return ticks / os.sysconf('SC_CLK_TCK')
+
+def request(base_url: Any, method: str, path: str, body: Any = None) -> int:
+    """
+    Send one JSON request to the app.
+
+    Parameters:
+        base_url (Any): The parsed base URL
+        method (str): The HTTP method
+        path (str): The path
+        body (Any, optional): The JSON body. Defaults to None.
+    Returns:
+        int: The response status
+    """
+
+    conn: http.client.HTTPConnection = http.client.HTTPConnection(base_url.hostname, base_url.port)
+
+    try:
+        conn.request(method, path, body=json.dumps(body), headers={'Content-Type': 'application/json'})
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+def subscribe(base_url: Any, watchlist_index: int) -> None:
+    """
+    Follow one watchlist's event stream, recording every change received.
+
+    Parameters:
+        base_url (Any): The parsed base URL
+        watchlist_index (int): The synthetic watchlist to follow
+    Returns:
+        None
+    """
+
+    conn: http.client.HTTPConnection = http.client.HTTPConnection(base_url.hostname, base_url.port)
+    conn.request('GET', f'/watchlist_events?watchlist=sse-load-{watchlist_index}')
+    response: http.client.HTTPResponse = conn.getresponse()
+
+    if response.status == 503:
+        with received_lock:
+            refused.append(watchlist_index)
+
+    connected.release()
+
+    if response.status != 200:
+        return
+
+    while True:
+        line: bytes = response.readline()
+
+        if not line:
+            return
+
+        if not line.startswith(b'data: '):
+            continue
+
+        now: float = time.perf_counter()
+
+        with received_lock:
+            for change in json.loads(line[len(b'data: '):]):
+                received.append((watchlist_index, change['episode_id'], now))
+
+def main() -> None:
+    """
+    Main function
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    base_url: Any = urlparse(sys.argv[1] if len(sys.argv) > 1 else 'http://127.0.0.1:5000')
+    clients: int = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    watchlists: int = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    saves: int = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+    pids: list[int] = [int(pid) for pid in sys.argv[5].split(',')] if len(sys.argv) > 5 else []
+
+    # create the watchlists up front, so every stream follows one by id from the start
+    for index in range(watchlists):
+        request(base_url, 'POST', '/mark_watched', {
+            "watchlist_uuid": f"sse-load-{index}",
+            "watchlist_display_name": "SSE load test",
+            "watched": 0,
+            "aired_before": "1900-01-01"
+        })
+
+    # the clients mostly sleep, they do not need the default stack
+    threading.stack_size(256 * 1024)
+
+    start: float = time.perf_counter()
+
+    for client in range(clients):
+        threading.Thread(target=subscribe, args=(base_url, client % watchlists), daemon=True).start()
+
+    for _ in range(clients):
+        connected.acquire()
+
+    print(f"{clients} clients on {watchlists} watchlists connected in {time.perf_counter() - start:.1f} s")
+
+    if len(refused) != 0:
+        print(f"{len(refused)} clients refused with 503, the workers' streams are full")
+
+    if len(pids) != 0:
+        cpu_before: float = get_cpu_seconds(pids)
+        time.sleep(IDLE_SECONDS)
+        cpu_used: float = get_cpu_seconds(pids) - cpu_before
+        print(f"server CPU while idle: {cpu_used:.2f} s over {IDLE_SECONDS:.0f} s ({cpu_used / IDLE_SECONDS:.1%})")
+
+    sent: dict[tuple[int, int], float] = {}
+
+    for save in range(saves):
+        watchlist_index: int = save % watchlists
+        episode_id: int = save + 1
+
+        sent[(watchlist_index, episode_id)] = time.perf_counter()
+
+        request(base_url, 'POST', '/save_watchlist', {
+            "watchlist_uuid": f"sse-load-{watchlist_index}",
+            "watchlist_display_name": "SSE load test",
+            "episode_watch_states": [{"episode_id": episode_id, "watched": 1}]
+        })
+
+        time.sleep(SAVE_INTERVAL)
+
+    time.sleep(SETTLE_SECONDS)
+
+    with received_lock:
+        latencies: list[float] = [
+            (received_at - sent[(watchlist_index, episode_id)]) * 1000
+            for watchlist_index, episode_id, received_at in received
+            if (watchlist_index, episode_id) in sent
+        ]
+
+    expected: int = sum(
+        len(range(watchlist_index, clients, watchlists)) - refused.count(watchlist_index)
+        for watchlist_index, _ in sent
+    )
+
+    print(f"{len(latencies)} of {expected} change deliveries received")
+
+    if len(latencies) > 1:
+        p95: float = statistics.quantiles(latencies, n=20)[-1]
+        print(f"delivery latency ms: p50 {statistics.median(latencies):.1f}, p95 {p95:.1f}, max {max(latencies):.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Measures the import time of main.py, the warm-up, and the first request before and after it.
+
+    python benchmarks/startup.py [top]
+"""
+
+# standard library full imports
+import os
+import subprocess
+import sys
+
+# standard library partial imports
+from typing import Any
+
+ROOT_DIRECTORY: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run in a fresh interpreter each time, so nothing is already imported or cached
+FIRST_REQUEST_SCRIPT: str = """
+import time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+if {warm}:
+    main.warm_up()
+warmed = time.perf_counter()
+client = main.app.test_client()
+client.get('/?watchlist=benchmark', headers={{'Accept-Encoding': 'gzip'}})
+first = time.perf_counter()
+client.get('/?watchlist=benchmark', headers={{'Accept-Encoding': 'gzip'}})
+second = time.perf_counter()
+print(imported - start, warmed - imported, first - warmed, second - first)
+"""
+
+def run_python(arguments: list[str]) -> subprocess.CompletedProcess:
+    """
+    Run a fresh python interpreter in the project directory.
+
+    Parameters:
+        arguments (list[str]): The interpreter arguments
+    Returns:
+        subprocess.CompletedProcess: The finished process
+    """
+
+    return subprocess.run(
+        [sys.executable] + arguments,
+        cwd=ROOT_DIRECTORY,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+def get_import_times() -> list[tuple[int, int, str]]:
+    """
+    Import main.py under -X importtime.
+
+    Parameters:
+        None
+    Returns:
+        list[tuple[int, int, str]]: Self and cumulative microseconds for each imported module
+    """
+
+    result: subprocess.CompletedProcess = run_python(['-X', 'importtime', '-c', 'import main'])
+
+    import_times: list[tuple[int, int, str]] = []
+
+    for line in result.stderr.splitlines():
+
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_time, cumulative, module = line[len('import time:'):].split('|')
+        import_times.append((int(self_time), int(cumulative), module.strip()))
+
+    return import_times
+
+def main() -> None:
+    """
+    Main function
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    top: int = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    import_times: list[tuple[int, int, str]] = get_import_times()
+
+    # top level imports are the only ones not indented under a parent
+    total: int = sum(cumulative for _, cumulative, module in import_times if module == module.lstrip())
+    main_total: int = next(cumulative for _, cumulative, module in import_times if module == 'main')
+
+    print(f"interpreter startup and imports: {total / 1000:.1f} ms, of which main: {main_total / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14}{'self ms':>10}  module")
+
+    for self_time, cumulative, module in sorted(import_times, key=lambda item: -item[1])[:top]:
+        print(f"{cumulative / 1000:>14.1f}{self_time / 1000:>10.1f}  {module.strip()}")
+
+    print()
+    print(f"{'':<10}{'import ms':>12}{'warm-up ms':>12}{'1st req ms':>12}{'2nd req ms':>12}")
+
+    for warm in [False, True]:
+        result: subprocess.CompletedProcess = run_python(['-c', FIRST_REQUEST_SCRIPT.format(warm=warm)])
+        timings: list[Any] = [float(value) * 1000 for value in result.stdout.split()]
+        label: str = 'warm' if warm else 'cold'
+        print(f"{label:<10}" + "".join(f"{timing:>12.1f}" for timing in timings))
+
+if __name__ == "__main__":
+    main()
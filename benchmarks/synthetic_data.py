@@ -0,0 +1,331 @@
+"""
+Generates synthetic catalogs and watchlists at scales well beyond the real Arrowverse.
+
+Shows are written as TVMaze-shaped JSON into <directory>/json and loaded
+through datasetup.save_show, so the catalog goes through the same code path
+as the real one. A viewing_order.json of random crossovers between episodes
+that share an air date is written beside the databases.
+
+    python benchmarks/synthetic_data.py <scale> [directory]
+"""
+
+# standard library full imports
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+# standard library partial imports
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# local full imports
+import datasetup
+
+@dataclass
+class SyntheticScale:
+    """
+    The SyntheticScale class describes the size of a synthetic dataset.
+    """
+    shows: int
+    seasons: int
+    episodes_per_season: int
+    watchlists: int
+    items_per_watchlist: int
+
+    @property
+    def episodes(self) -> int:
+        return self.shows * self.seasons * self.episodes_per_season
+
+# constants
+SCALES: dict[str, SyntheticScale] = {
+    "one-show": SyntheticScale(1, 1, 10, 10, 5),
+    "arrowverse": SyntheticScale(6, 6, 20, 1000, 100),
+    "10k": SyntheticScale(50, 10, 20, 10000, 100),
+    "100k": SyntheticScale(250, 20, 20, 50000, 100),
+    "1m": SyntheticScale(2000, 20, 25, 100000, 100),
+}
+SEED: int = 26
+START_DATE: date = date(2012, 10, 10)
+WATCHLIST_BATCH_SIZE: int = 10000
+CROSSOVERS: int = 50
+CROSSOVER_MAX_EPISODES: int = 4
+
+def get_show_name(index: int) -> str:
+    """
+    Get the name of a synthetic show.
+
+    Parameters:
+        index (int): The show number
+    Returns:
+        str: The show name
+    """
+
+    return f"Synthetic Show {index:05d}"
+
+def build_show_json(index: int, scale: SyntheticScale, rng: random.Random) -> dict[str, Any]:
+    """
+    Build a TVMaze-shaped show with embedded seasons and episodes.
+
+    Shows start a few days apart and air weekly, so many episodes share an
+    air date across shows, as crossovers do.
+
+    Parameters:
+        index (int): The show number
+        scale (SyntheticScale): The dataset size
+        rng (random.Random): The random number generator
+    Returns:
+        dict[str, Any]: The show, as returned by the TVMaze API
+    """
+
+    first_air_date: date = START_DATE + timedelta(days=rng.randrange(0, 7 * 52))
+
+    episodes: list[dict[str, Any]] = []
+
+    for season in range(1, scale.seasons + 1):
+        for episode in range(1, scale.episodes_per_season + 1):
+            week: int = (season - 1) * (scale.episodes_per_season + 10) + episode - 1
+
+            episodes.append({
+                "season": season,
+                "number": episode,
+                "name": f"Episode {season}x{episode:02d}",
+                "airdate": (first_air_date + timedelta(weeks=week)).isoformat(),
+                "image": {"original": f"https://example.invalid/{index}/{season}/{episode}.jpg"}
+            })
+
+    return {
+        "name": get_show_name(index),
+        "image": {"original": f"https://example.invalid/{index}.jpg"},
+        "_embedded": {
+            "seasons": [{"number": season} for season in range(1, scale.seasons + 1)],
+            "episodes": episodes
+        }
+    }
+
+def use_directory(directory: str) -> None:
+    """
+    Point datasetup at a directory of its own, away from the real databases.
+
+    Parameters:
+        directory (str): The directory for the JSON and databases
+    Returns:
+        None
+    """
+
+    datasetup.JSON_DIRECTORY = os.path.join(directory, "json")
+    datasetup.CATALOG_DB_FILENAME = os.path.join(directory, "catalog.db")
+    datasetup.CATALOG_BUILD_FILENAME = f"{datasetup.CATALOG_DB_FILENAME}.build"
+    datasetup.WATCHLIST_DB_FILENAME = os.path.join(directory, "watchlists.db")
+
+def generate_catalog(scale: SyntheticScale, rng: random.Random) -> None:
+    """
+    Write the synthetic shows as JSON, then build and publish the catalog from them.
+
+    Parameters:
+        scale (SyntheticScale): The dataset size
+        rng (random.Random): The random number generator
+    Returns:
+        None
+    """
+
+    if not os.path.exists(datasetup.JSON_DIRECTORY):
+        os.makedirs(datasetup.JSON_DIRECTORY)
+
+    datasetup.create_catalog_database()
+
+    for index in range(scale.shows):
+        show: dict[str, Any] = build_show_json(index, scale, rng)
+
+        with open(f"{datasetup.JSON_DIRECTORY}/{show['name']}.json", 'w') as f:
+            json.dump(show, f)
+
+        background_color: str = f"#{rng.randrange(0x1000000):06x}"
+        datasetup.save_show(show['name'], "0", background_color, "#ffffff")
+
+    datasetup.publish_catalog_database()
+
+def generate_watchlists(scale: SyntheticScale, rng: random.Random) -> None:
+    """
+    Create synthetic watchlists, each with a random set of watch states.
+
+    Parameters:
+        scale (SyntheticScale): The dataset size
+        rng (random.Random): The random number generator
+    Returns:
+        None
+    """
+
+    datasetup.create_watchlist_database()
+
+    items_per_watchlist: int = min(scale.items_per_watchlist, scale.episodes)
+
+    with sqlite3.connect(datasetup.WATCHLIST_DB_FILENAME) as conn:
+        cursor: sqlite3.Cursor = conn.cursor()
+
+        for start in range(0, scale.watchlists, WATCHLIST_BATCH_SIZE):
+            end: int = min(start + WATCHLIST_BATCH_SIZE, scale.watchlists)
+
+            cursor.executemany("""
+                INSERT
+                INTO Watchlists (
+                    WatchlistId,
+                    WatchlistUUID,
+                    DisplayName
+                )
+                VALUES (
+                    ?,
+                    ?,
+                    ?
+                )
+            """, [(index + 1, f"synthetic-{index}", f"Watchlist {index}") for index in range(start, end)])
+
+            # episode ids run from 1 as the catalog is built into an empty file
+            cursor.executemany("""
+                INSERT
+                INTO WatchlistItems (
+                    WatchlistId,
+                    EpisodeId,
+                    Watched
+                )
+                VALUES (
+                    ?,
+                    ?,
+                    ?
+                )
+            """, [
+                (index + 1, episode_id, rng.choice([0, 1, 1, 1]))
+                for index in range(start, end)
+                for episode_id in rng.sample(range(1, scale.episodes + 1), items_per_watchlist)
+            ])
+
+            conn.commit()
+
+def generate_viewing_order(directory: str, rng: random.Random) -> int:
+    """
+    Write a viewing_order.json of random crossovers between episodes that share an air date.
+
+    Each crossover lists its episodes in a random order, so most of them
+    are reordered from air date order. One also lists an episode that is
+    not in the catalog, which must be ignored.
+
+    Parameters:
+        directory (str): The directory for the viewing order
+        rng (random.Random): The random number generator
+    Returns:
+        int: The number of crossovers written
+    """
+
+    with sqlite3.connect(datasetup.CATALOG_DB_FILENAME) as conn:
+        cursor: sqlite3.Cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT
+            AirDate
+            FROM
+            Episodes
+            GROUP BY AirDate
+            HAVING COUNT(*) > 1
+            ORDER BY AirDate
+        """)
+
+        shared_air_dates: list[str] = [row[0] for row in cursor.fetchall()]
+        air_dates: list[str] = rng.sample(shared_air_dates, min(CROSSOVERS, len(shared_air_dates)))
+
+        cursor.execute(f"""
+            SELECT
+            Episodes.AirDate,
+            Shows.Name,
+            Seasons.SeasonNumber,
+            Episodes.EpisodeNumber
+            FROM Episodes
+            JOIN Seasons
+            ON Episodes.SeasonId = Seasons.SeasonId
+            JOIN Shows
+            ON Seasons.ShowId = Shows.ShowId
+            WHERE Episodes.AirDate IN ({",".join("?" for _ in air_dates)})
+            ORDER BY Episodes.AirDate, Episodes.EpisodeId
+        """, air_dates)
+
+        episodes_by_air_date: dict[str, list[list[Any]]] = {}
+
+        for air_date, show, season, episode in cursor.fetchall():
+            episodes_by_air_date.setdefault(air_date, []).append([show, season, episode])
+
+    crossovers: list[dict[str, Any]] = [
+        {
+            "name": f"Crossover {air_date}",
+            "episodes": rng.sample(episodes, min(CROSSOVER_MAX_EPISODES, len(episodes)))
+        }
+        for air_date, episodes in sorted(episodes_by_air_date.items())
+    ]
+
+    if len(crossovers) != 0:
+        crossovers[0]["episodes"].insert(1, ["Not A Synthetic Show", 1, 1])
+
+    with open(os.path.join(directory, "viewing_order.json"), 'w') as f:
+        json.dump({"crossovers": crossovers}, f, indent=4)
+
+    return len(crossovers)
+
+def generate(scale_name: str, directory: str) -> None:
+    """
+    Generate a synthetic catalog and watchlists into a directory.
+
+    Parameters:
+        scale_name (str): One of SCALES
+        directory (str): The directory for the JSON and databases
+    Returns:
+        None
+    """
+
+    scale: SyntheticScale = SCALES[scale_name]
+    rng: random.Random = random.Random(SEED)
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    use_directory(directory)
+
+    # start from nothing, the watchlists point at episode ids of this catalog
+    for filename in [datasetup.CATALOG_DB_FILENAME, datasetup.WATCHLIST_DB_FILENAME]:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    start: float = time.perf_counter()
+    generate_catalog(scale, rng)
+    print(f"{scale_name}: {scale.episodes} episodes in {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    generate_watchlists(scale, rng)
+    print(f"{scale_name}: {scale.watchlists} watchlists in {time.perf_counter() - start:.1f} s")
+
+    crossovers: int = generate_viewing_order(directory, rng)
+    print(f"{scale_name}: {crossovers} crossovers in viewing_order.json")
+
+def main() -> None:
+    """
+    Main function
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    if len(sys.argv) < 2 or sys.argv[1] not in SCALES:
+        print(f"usage: {sys.argv[0]} <{'|'.join(SCALES)}> [directory]")
+        sys.exit(1)
+
+    scale_name: str = sys.argv[1]
+    directory: str = sys.argv[2] if len(sys.argv) > 2 else os.path.join("synthetic", scale_name)
+
+    generate(scale_name, directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+In-process fan-out of watchlist change notifications to waiting subscribers.
+"""
+
+# standard library full imports
+import logging
+import os
+import threading
+
+# standard library partial imports
+from typing import Callable, Union
+
+# waits on this key are woken by a change to any watchlist, watchlist ids start at 1
+ANY_WATCHLIST: int = 0
+
+class ChangeNotifier:
+    """
+    The ChangeNotifier class wakes the subscribers of a watchlist when it changes.
+
+    One background thread per process calls poll every interval seconds,
+    or straight away after wake(). poll returns the latest change id of
+    every watchlist that changed since its last call, and only the
+    subscribers of those watchlists are woken, along with any waiting on
+    ANY_WATCHLIST. Idle subscribers block on a condition, so they cost no
+    CPU however many there are.
+    """
+
+    def __init__(self, poll: Callable[[], dict[int, int]], interval: float, logger: logging.Logger) -> None:
+        self.poll: Callable[[], dict[int, int]] = poll
+        self.interval: float = interval
+        self.logger: logging.Logger = logger
+        self.lock: threading.Lock = threading.Lock()
+        self.conditions: dict[int, threading.Condition] = {}
+        self.subscribers: dict[int, int] = {}
+        self.latest: dict[int, int] = {}
+        self.poke: threading.Event = threading.Event()
+        self.poller_pid: int = -1
+
+    def start(self) -> None:
+        """
+        Start the polling thread if this process does not have one yet.
+
+        Parameters:
+            None
+        Returns:
+            None
+        """
+
+        with self.lock:
+
+            # threads do not survive a fork, so each worker starts its own
+            if self.poller_pid == os.getpid():
+                return
+
+            self.poller_pid = os.getpid()
+
+        threading.Thread(target=self.run, name="change-notifier", daemon=True).start()
+
+    def run(self) -> None:
+        """
+        Poll for changes until the process exits.
+
+        Parameters:
+            None
+        Returns:
+            None
+        """
+
+        while True:
+            self.poke.wait(self.interval)
+            self.poke.clear()
+
+            try:
+                self.publish(self.poll())
+            except Exception:
+                # keep serving, the next poll will pick the changes up
+                self.logger.exception("Change notifier poll failed")
+
+    def wake(self) -> None:
+        """
+        Poll straight away, e.g. after this process committed a change.
+
+        Parameters:
+            None
+        Returns:
+            None
+        """
+
+        self.poke.set()
+
+    def publish(self, changes: dict[int, int]) -> None:
+        """
+        Wake the subscribers of every changed watchlist.
+
+        Parameters:
+            changes (dict[int, int]): The latest change id keyed by watchlist id
+        Returns:
+            None
+        """
+
+        if len(changes) != 0:
+            changes = {**changes, ANY_WATCHLIST: max(changes.values())}
+
+        with self.lock:
+            for watchlist_id, change_id in changes.items():
+
+                # remembered even with nobody listening, for a subscriber about to wait
+                self.latest[watchlist_id] = max(change_id, self.latest.get(watchlist_id, 0))
+
+                condition: Union[threading.Condition, None] = self.conditions.get(watchlist_id)
+
+                if condition is not None:
+                    condition.notify_all()
+
+    def get_latest(self, watchlist_id: int) -> int:
+        """
+        Get the latest change id announced for a watchlist.
+
+        Parameters:
+            watchlist_id (int): The watchlist id, or ANY_WATCHLIST
+        Returns:
+            int: The change id, 0 if none has been announced
+        """
+
+        with self.lock:
+            return self.latest.get(watchlist_id, 0)
+
+    def wait(self, watchlist_id: int, after: int, timeout: float) -> bool:
+        """
+        Wait until a watchlist has a change newer than after, or the timeout passes.
+
+        Parameters:
+            watchlist_id (int): The watchlist id, or ANY_WATCHLIST
+            after (int): The last change id the subscriber has seen
+            timeout (float): The most seconds to wait
+        Returns:
+            bool: Whether a newer change was announced
+        """
+
+        self.start()
+
+        with self.lock:
+            condition: Union[threading.Condition, None] = self.conditions.get(watchlist_id)
+
+            if condition is None:
+                condition = threading.Condition(self.lock)
+                self.conditions[watchlist_id] = condition
+
+            self.subscribers[watchlist_id] = self.subscribers.get(watchlist_id, 0) + 1
+
+            try:
+                return condition.wait_for(
+                    lambda: self.latest.get(watchlist_id, 0) > after,
+                    timeout
+                )
+            finally:
+                self.subscribers[watchlist_id] -= 1
+
+                # forget watchlists nobody is waiting on
+                if self.subscribers[watchlist_id] == 0:
+                    del self.subscribers[watchlist_id]
+                    del self.conditions[watchlist_id]
@@ -7,6 +7,7 @@ import json
 import os
 import requests
 import sqlite3
+import uuid
 
 # standard library partial imports
 from dataclasses import dataclass
@@ -58,11 +59,17 @@ class Episode:
 
 # constants
 JSON_DIRECTORY: str = "json"
-DB_FILENAME: str = "arrowverse.db"
+CATALOG_DB_FILENAME: str = os.environ.get("ARROWVERSE_CATALOG_DB", "catalog.db")
+CATALOG_BUILD_FILENAME: str = f"{CATALOG_DB_FILENAME}.build"
+WATCHLIST_DB_FILENAME: str = os.environ.get("ARROWVERSE_WATCHLIST_DB", "watchlists.db")
+LEGACY_DB_FILENAME: str = "arrowverse.db"
 
-def create_sqlite_database() -> None:
+def create_catalog_database() -> None:
     """
-    Creates the SQLite database and tables if they do not exist.
+    Creates a fresh catalog build database and its tables.
+
+    The catalog is built into CATALOG_BUILD_FILENAME and only becomes visible
+    to the application once publish_catalog_database() renames it into place.
 
     Parameters:
         None
@@ -70,7 +77,11 @@ def create_sqlite_database() -> None:
         None
     """
 
-    with sqlite3.connect(DB_FILENAME) as conn:
+    # always start the build from an empty file
+    if os.path.exists(CATALOG_BUILD_FILENAME):
+        os.remove(CATALOG_BUILD_FILENAME)
+
+    with sqlite3.connect(CATALOG_BUILD_FILENAME) as conn:
         cursor = conn.cursor()
 
         cursor.execute("""
@@ -107,6 +118,141 @@ def create_sqlite_database() -> None:
         """
                        )
 
+        # the ids episodes had in the published catalog, see carry_forward_episode_ids()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS PreviousEpisodes (
+                ShowName TEXT NOT NULL,
+                SeasonNumber INTEGER NOT NULL,
+                EpisodeNumber INTEGER NOT NULL,
+                EpisodeId INTEGER NOT NULL,
+                PRIMARY KEY (ShowName, SeasonNumber, EpisodeNumber)
+            );
+        """
+                       )
+
+        conn.commit()
+
+    carry_forward_episode_ids()
+
+def carry_forward_episode_ids() -> None:
+    """
+    Copies the episode ids of the published catalog into the catalog build database.
+
+    WatchlistItems refer to episodes by EpisodeId, so an episode must keep
+    its id from one release to the next. save_show() reuses the id of the
+    episode with the same show name, season and episode number, and the
+    Episodes id sequence starts above every id ever published, so new
+    episodes never take an id that a watchlist may still point at.
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    if not os.path.exists(CATALOG_DB_FILENAME):
+        return
+
+    with sqlite3.connect(CATALOG_BUILD_FILENAME) as conn:
+        cursor: sqlite3.Cursor = conn.cursor()
+
+        cursor.execute("ATTACH DATABASE ? AS previous", (CATALOG_DB_FILENAME,))
+
+        cursor.execute("""
+            INSERT OR IGNORE
+            INTO PreviousEpisodes (
+                ShowName,
+                SeasonNumber,
+                EpisodeNumber,
+                EpisodeId
+            )
+            SELECT
+            Shows.Name,
+            Seasons.SeasonNumber,
+            Episodes.EpisodeNumber,
+            Episodes.EpisodeId
+            FROM previous.Episodes AS Episodes
+            JOIN previous.Seasons AS Seasons
+            ON Episodes.SeasonId = Seasons.SeasonId
+            JOIN previous.Shows AS Shows
+            ON Seasons.ShowId = Shows.ShowId
+        """)
+
+        # ids of episodes since removed are not handed out again either
+        cursor.execute("""
+            INSERT
+            INTO sqlite_sequence (
+                name,
+                seq
+            )
+            SELECT
+            'Episodes',
+            COALESCE(MAX(seq), 0)
+            FROM (
+                SELECT seq FROM previous.sqlite_sequence WHERE name = 'Episodes'
+                UNION ALL
+                SELECT MAX(EpisodeId) FROM previous.Episodes
+            )
+        """)
+
+        conn.commit()
+        cursor.execute("DETACH DATABASE previous")
+
+def publish_catalog_database() -> None:
+    """
+    Publishes the catalog build database.
+
+    The build file is stamped with a new release version, compacted and then
+    atomically renamed over CATALOG_DB_FILENAME. The application opens the
+    catalog as immutable, so the published file must never be modified in
+    place; every release is a new file swapped in by rename.
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    conn: sqlite3.Connection = sqlite3.connect(CATALOG_BUILD_FILENAME)
+
+    try:
+        # only needed while building
+        conn.execute("DROP TABLE IF EXISTS PreviousEpisodes")
+
+        # running workers compare this against their cached copy of the catalog
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS CatalogVersion (
+                Version TEXT NOT NULL
+            );
+        """)
+        conn.execute("DELETE FROM CatalogVersion")
+        conn.execute("INSERT INTO CatalogVersion (Version) VALUES (?)", (uuid.uuid4().hex,))
+        conn.commit()
+
+        # a rollback journal leaves no side files behind for the rename
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(CATALOG_BUILD_FILENAME, CATALOG_DB_FILENAME)
+
+def create_watchlist_database() -> None:
+    """
+    Creates the watchlist database and tables if they do not exist.
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    with sqlite3.connect(WATCHLIST_DB_FILENAME) as conn:
+        cursor = conn.cursor()
+
+        # writers no longer block readers of the watchlist database
+        cursor.execute("PRAGMA journal_mode = WAL")
+
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS Watchlists (
                 WatchlistId INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -122,12 +268,46 @@ def create_sqlite_database() -> None:
                 WatchlistId INTEGER NOT NULL,
                 EpisodeId INTEGER NOT NULL,
                 Watched INTEGER DEFAULT 0,
-                FOREIGN KEY(WatchlistId) REFERENCES Watchlists(WatchlistId),
-                FOREIGN KEY(EpisodeId) REFERENCES Episodes(EpisodeId)
+                FOREIGN KEY(WatchlistId) REFERENCES Watchlists(WatchlistId)
+            );
+        """
+                       )
+
+        # keep one row per episode so watch states can be upserted
+        cursor.execute("""
+            DELETE FROM WatchlistItems
+            WHERE WatchlistItemId NOT IN (
+                SELECT MAX(WatchlistItemId)
+                FROM WatchlistItems
+                GROUP BY WatchlistId, EpisodeId
+            );
+        """
+                       )
+
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS WatchlistItemsWatchlistEpisode
+            ON WatchlistItems (WatchlistId, EpisodeId);
+        """
+                       )
+
+        # every saved watch state, in order, for the change feed
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS WatchlistChanges (
+                ChangeId INTEGER PRIMARY KEY AUTOINCREMENT,
+                WatchlistId INTEGER NOT NULL,
+                EpisodeId INTEGER NOT NULL,
+                Watched INTEGER NOT NULL,
+                FOREIGN KEY(WatchlistId) REFERENCES Watchlists(WatchlistId)
             );
         """
                        )
 
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS WatchlistChangesWatchlist
+            ON WatchlistChanges (WatchlistId, ChangeId);
+        """
+                       )
+
         conn.commit()
 
 def save_show(show_name: str, show_code: str, background_color: str, foreground_color: str) -> None:
@@ -179,7 +359,7 @@ def save_show(show_name: str, show_code: str, background_color: str, foreground_
 
         # get seasons and episodes
 
-        with sqlite3.connect(DB_FILENAME) as conn:
+        with sqlite3.connect(CATALOG_BUILD_FILENAME) as conn:
             cursor: sqlite3.Cursor = conn.cursor()
 
             # create show object
@@ -279,10 +459,12 @@ def save_show(show_name: str, show_code: str, background_color: str, foreground_
                     episode_image
                 )
 
+                # keep the published id, a new episode gets the next one in the sequence
                 cursor.execute(
                     """
                     INSERT INTO
                     Episodes (
+                        EpisodeId,
                         SeasonId,
                         EpisodeNumber,
                         Name,
@@ -290,6 +472,16 @@ def save_show(show_name: str, show_code: str, background_color: str, foreground_
                         Image
                     )
                     VALUES (
+                        (
+                            SELECT
+                            EpisodeId
+                            FROM
+                            PreviousEpisodes
+                            WHERE
+                            ShowName = ?
+                            AND SeasonNumber = ?
+                            AND EpisodeNumber = ?
+                        ),
                         ?,
                         ?,
                         ?,
@@ -297,6 +489,9 @@ def save_show(show_name: str, show_code: str, background_color: str, foreground_
                         ?
                     )
                     """, (
+                        show_obj.name,
+                        season_number,
+                        episode_obj.episode_number,
                         season_id,
                         episode_obj.episode_number,
                         episode_obj.name,
@@ -307,6 +502,45 @@ def save_show(show_name: str, show_code: str, background_color: str, foreground_
 
             conn.commit()
 
+def migrate_legacy_database() -> None:
+    """
+    Splits the legacy single-file database into the catalog and watchlist databases.
+
+    The catalog tables are copied with their ids intact, so existing
+    WatchlistItems keep pointing at the same episodes.
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    create_catalog_database()
+
+    with sqlite3.connect(CATALOG_BUILD_FILENAME) as conn:
+        cursor: sqlite3.Cursor = conn.cursor()
+
+        cursor.execute("ATTACH DATABASE ? AS legacy", (LEGACY_DB_FILENAME,))
+
+        for table in ["Shows", "Seasons", "Episodes"]:
+            cursor.execute(f"INSERT INTO {table} SELECT * FROM legacy.{table}")
+
+        conn.commit()
+        cursor.execute("DETACH DATABASE legacy")
+
+    publish_catalog_database()
+
+    with sqlite3.connect(WATCHLIST_DB_FILENAME) as conn:
+        cursor: sqlite3.Cursor = conn.cursor()
+
+        cursor.execute("ATTACH DATABASE ? AS legacy", (LEGACY_DB_FILENAME,))
+
+        for table in ["Watchlists", "WatchlistItems"]:
+            cursor.execute(f"INSERT OR IGNORE INTO {table} SELECT * FROM legacy.{table}")
+
+        conn.commit()
+        cursor.execute("DETACH DATABASE legacy")
+
 def main() -> None:
     """
     Main function
@@ -317,7 +551,14 @@ def main() -> None:
         None
     """
 
-    create_sqlite_database()
+    create_watchlist_database()
+
+    # carry an existing single-file install over without refetching
+    if os.path.exists(LEGACY_DB_FILENAME) and not os.path.exists(CATALOG_DB_FILENAME):
+        migrate_legacy_database()
+        return
+
+    create_catalog_database()
 
     shows: list[TVMazeShow] = [
         TVMazeShow("Arrow", "4", "#013300", "#ffffff"),
@@ -332,5 +573,7 @@ def main() -> None:
         save_show(show.showname, show.showcode,
                   show.background_color, show.foreground_color)
 
+    publish_catalog_database()
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,56 @@
+"""
+Gunicorn settings for running the flask application with several workers.
+
+    gunicorn main:app
+"""
+
+# standard library full imports
+import gc
+import multiprocessing
+import os
+
+# standard library partial imports
+from typing import Any
+
+bind: str = os.environ.get("ARROWVERSE_BIND", "127.0.0.1:5000")
+workers: int = int(os.environ.get("ARROWVERSE_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+
+# each open /watchlist_events stream holds a thread, idle ones cost no CPU;
+# main.py caps streams at ARROWVERSE_MAX_STREAMS, 80% of threads by default,
+# so the rest of the threads are always free for other requests
+worker_class: str = "gthread"
+threads: int = int(os.environ.get("ARROWVERSE_THREADS", "100"))
+
+# import main.py, and so load the catalog, once in the master before forking
+preload_app: bool = True
+
+def when_ready(server: Any) -> None:
+    """
+    Compile the templates before forking, then freeze the preloaded objects
+    so the garbage collector leaves their pages shared.
+
+    Parameters:
+        server (Any): The gunicorn arbiter
+    Returns:
+        None
+    """
+
+    import main
+
+    main.compile_templates()
+
+    gc.freeze()
+
+def post_worker_init(worker: Any) -> None:
+    """
+    Warm each worker up before it accepts requests.
+
+    Parameters:
+        worker (Any): The gunicorn worker
+    Returns:
+        None
+    """
+
+    import main
+
+    main.warm_up()
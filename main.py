@@ -3,14 +3,39 @@ The flask application.
 """
 
 # standard library full imports
+import csv
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import math
+import os
+import queue
 import sqlite3
+import threading
+import time
 
 # standard library partial imports
-from dataclasses import dataclass
-from typing import Any, Union
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from datetime import date
+from typing import Any, Iterator, Union
+from urllib.parse import quote
+
+# third party library full imports
+try:
+    import brotli
+except ImportError:  # optional, responses fall back to gzip
+    brotli = None
 
 # third party library partial imports
-from flask import Flask, redirect, render_template, request, url_for
+from flask import Flask, Response, jsonify, redirect, render_template, request, stream_with_context, url_for
+
+# local partial imports
+from changefeed import ANY_WATCHLIST, ChangeNotifier
+from throttling import RateLimiter, SaveDebouncer, SingleFlight
 
 @dataclass
 class ArrowverseShow():
@@ -21,6 +46,7 @@ class ArrowverseShow():
     show_image: str
     background_color: str = "#000000"
     foreground_color: str = "#ffffff"
+    show_id: int = 0
 
 @dataclass
 class ArrowverseShowEpisode:
@@ -37,6 +63,7 @@ class ArrowverseShowEpisode:
     background_color: str = "#000000"
     foreground_color: str = "#ffffff"
     watched: int = 0
+    show_id: int = 0
 
 @dataclass
 class EpisodeWatchState:
@@ -46,8 +73,280 @@ class EpisodeWatchState:
     episode_id: int
     watched: int = 0
 
+@dataclass
+class StaticAsset:
+    """
+    The StaticAsset class represents a fingerprinted static file.
+    """
+    filename: str
+    content: bytes
+    mimetype: str
+    compressed: dict[str, bytes] = field(default_factory=dict)
+
+@dataclass
+class CatalogCache:
+    """
+    The CatalogCache class holds a worker's copy of one catalog release.
+    """
+    version: str
+    shows: list[ArrowverseShow] = field(default_factory=list)
+    episodes: list[ArrowverseShowEpisode] = field(default_factory=list)
+    episode_ids: dict[tuple[str, int, int], int] = field(default_factory=dict)
+    episodes_by_id: dict[int, ArrowverseShowEpisode] = field(default_factory=dict)
+    viewing_order: list[int] = field(default_factory=list)
+    show_stylesheet: Union[StaticAsset, None] = None
+
+@dataclass
+class WatchlistCache:
+    """
+    The WatchlistCache class holds a worker's copy of one watchlist's state.
+    """
+    watched: dict[int, int] = field(default_factory=dict)
+    next_up_position: Union[int, None] = None
+
+@dataclass
+class PooledConnection:
+    """
+    The PooledConnection class represents an idle watchlist database connection.
+    """
+    connection: sqlite3.Connection
+    catalog_version: str
+
+@dataclass
+class WatchlistRecord:
+    """
+    The WatchlistRecord class represents one exported or imported watch state.
+
+    Episodes are identified by show name, season and episode number rather
+    than EpisodeId, which is only meaningful to the catalog of one install.
+    """
+    watchlist_uuid: str
+    display_name: str
+    show: str
+    season: int
+    episode: int
+    watched: int = 0
+
+# constants
+CATALOG_DB_FILENAME: str = os.environ.get("ARROWVERSE_CATALOG_DB", "catalog.db")
+WATCHLIST_DB_FILENAME: str = os.environ.get("ARROWVERSE_WATCHLIST_DB", "watchlists.db")
+CATALOG_MMAP_SIZE: int = 1024 * 1024 * 1024
+CACHE_CHECK_INTERVAL: float = float(os.environ.get("ARROWVERSE_CACHE_CHECK_INTERVAL", "1.0"))
+WATCHLIST_CACHE_SIZE: int = int(os.environ.get("ARROWVERSE_WATCHLIST_CACHE_SIZE", "10000"))
+EXPORT_FIELDS: list[str] = ["watchlist_uuid", "display_name", "show", "season", "episode", "watched"]
+EXPORT_BATCH_SIZE: int = 1000
+IMPORT_BATCH_SIZE: int = 5000
+IMPORT_MAX_ERRORS: int = 20
+ADMIN_TOKEN: str = os.environ.get("ARROWVERSE_ADMIN_TOKEN", "")
+VIEWING_ORDER_FILENAME: str = os.environ.get("ARROWVERSE_VIEWING_ORDER", "viewing_order.json")
+NEXT_UP_DEFAULT_COUNT: int = 5
+NEXT_UP_MAX_COUNT: int = 50
+ASSET_MIMETYPES: dict[str, str] = {
+    '.css': 'text/css',
+    '.js': 'text/javascript',
+}
+ASSET_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+COMPRESSIBLE_MIMETYPES: list[str] = [
+    'text/html',
+    'text/css',
+    'text/javascript',
+    'text/csv',
+    'application/json',
+]
+COMPRESS_MIN_SIZE: int = 1024
+WATCHLIST_POOL_SIZE: int = int(os.environ.get("ARROWVERSE_POOL_SIZE", "8"))
+STATEMENT_CACHE_SIZE: int = 256
+WARM_UP_WATCHLIST_UUID: str = "warm-up"
+RATE_LIMIT_RATE: float = float(os.environ.get("ARROWVERSE_RATE_LIMIT_RATE", "5"))
+RATE_LIMIT_BURST: float = float(os.environ.get("ARROWVERSE_RATE_LIMIT_BURST", "20"))
+SAVE_DEBOUNCE_SECONDS: float = float(os.environ.get("ARROWVERSE_SAVE_DEBOUNCE", "0.05"))
+CHANGE_POLL_INTERVAL: float = float(os.environ.get("ARROWVERSE_CHANGE_POLL_INTERVAL", "0.5"))
+CHANGE_HEARTBEAT_SECONDS: float = 15.0
+CHANGE_UNKNOWN_WATCHLIST_SECONDS: float = 60.0
+CHANGE_STREAM_RETRY_SECONDS: int = 30
+# below gunicorn's threads, so streams never take every thread of a worker
+MAX_CHANGE_STREAMS: int = int(os.environ.get(
+    "ARROWVERSE_MAX_STREAMS",
+    int(os.environ.get("ARROWVERSE_THREADS", "100")) * 4 // 5
+))
+CHANGE_BATCH_SIZE: int = 500
+CHANGE_LOG_RETENTION: int = int(os.environ.get("ARROWVERSE_CHANGE_LOG_RETENTION", "1000000"))
+SHOWNAME_MAP: dict[str, str] = {
+    'dclot': "DC's Legends of Tomorrow",
+    'tf': 'The Flash',
+    'a': 'Arrow',
+    'sg': 'Supergirl',
+    'bw': 'Batwoman',
+    'bl': 'Black Lightning',
+}
+
 app = Flask(__name__)
 
+# per-process caches, see refresh_caches()
+cache_lock: threading.Lock = threading.Lock()
+catalog_cache: Union[CatalogCache, None] = None
+watchlist_caches: "OrderedDict[str, WatchlistCache]" = OrderedDict()
+watchlist_cache_generation: int = 0
+watchlist_monitor: Union[sqlite3.Connection, None] = None
+watchlist_monitor_pid: int = -1
+watchlist_data_version: int = -1
+watchlist_change_id: int = -1
+last_cache_check: float = 0.0
+
+# per-process pool of watchlist connections, see watchlist_connection()
+watchlist_pool: "queue.LifoQueue[PooledConnection]" = queue.LifoQueue(WATCHLIST_POOL_SIZE)
+watchlist_pool_pid: int = os.getpid()
+
+# set once warm_up() has run
+ready: threading.Event = threading.Event()
+
+# per-process count of open /watchlist_events streams, see watchlist_events()
+change_stream_slots: threading.BoundedSemaphore = threading.BoundedSemaphore(max(MAX_CHANGE_STREAMS, 0))
+
+# used by the change notifier's thread only, see poll_watchlist_changes()
+change_monitor: Union[sqlite3.Connection, None] = None
+change_data_version: int = -1
+last_change_id: int = -1
+
+def get_catalog_uri() -> str:
+    """
+    Get the URI used to open the catalog database.
+
+    The catalog is opened read-only and immutable, so SQLite takes no locks
+    on it and never checks it for changes made by other connections.
+
+    Parameters:
+        None
+    Returns:
+        str: The catalog database URI
+    """
+
+    return f"file:{quote(CATALOG_DB_FILENAME)}?mode=ro&immutable=1"
+
+def connect_catalog() -> sqlite3.Connection:
+    """
+    Open a connection to the immutable catalog database.
+
+    Parameters:
+        None
+    Returns:
+        sqlite3.Connection: A connection to the catalog database
+    """
+
+    conn: sqlite3.Connection = sqlite3.connect(get_catalog_uri(), uri=True)
+
+    # read the catalog straight out of the page cache
+    conn.execute(f"PRAGMA mmap_size = {CATALOG_MMAP_SIZE}")
+
+    return conn
+
+def connect_watchlists() -> sqlite3.Connection:
+    """
+    Open a connection to the watchlist database with the catalog attached as "catalog".
+
+    Parameters:
+        None
+    Returns:
+        sqlite3.Connection: A connection to the watchlist database
+    """
+
+    conn: sqlite3.Connection = sqlite3.connect(
+        WATCHLIST_DB_FILENAME,
+        uri=True,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+
+    conn.execute("ATTACH DATABASE ? AS catalog", (get_catalog_uri(),))
+    conn.execute(f"PRAGMA catalog.mmap_size = {CATALOG_MMAP_SIZE}")
+
+    return conn
+
+def get_watchlist_pool() -> "queue.LifoQueue[PooledConnection]":
+    """
+    Get this process's pool of idle watchlist connections.
+
+    A forked worker starts with an empty pool of its own and leaves the
+    connections inherited from its parent alone.
+
+    Parameters:
+        None
+    Returns:
+        queue.LifoQueue[PooledConnection]: The pool
+    """
+
+    global watchlist_pool, watchlist_pool_pid
+
+    if watchlist_pool_pid != os.getpid():
+        watchlist_pool = queue.LifoQueue(WATCHLIST_POOL_SIZE)
+        watchlist_pool_pid = os.getpid()
+
+    return watchlist_pool
+
+def acquire_watchlist_connection() -> PooledConnection:
+    """
+    Take a connection from the pool, or open one if the pool is empty.
+
+    A pooled connection that has the previous catalog release attached is
+    replaced, as an immutable catalog is never re-read once opened.
+
+    Parameters:
+        None
+    Returns:
+        PooledConnection: The connection
+    """
+
+    catalog_version: str = get_catalog().version
+
+    try:
+        pooled: PooledConnection = get_watchlist_pool().get_nowait()
+    except queue.Empty:
+        return PooledConnection(connect_watchlists(), catalog_version)
+
+    if pooled.catalog_version != catalog_version:
+        pooled.connection.close()
+        return PooledConnection(connect_watchlists(), catalog_version)
+
+    return pooled
+
+def release_watchlist_connection(pooled: PooledConnection) -> None:
+    """
+    Return a connection to the pool, closing it if the pool is full.
+
+    Parameters:
+        pooled (PooledConnection): The connection
+    Returns:
+        None
+    """
+
+    try:
+        get_watchlist_pool().put_nowait(pooled)
+    except queue.Full:
+        pooled.connection.close()
+
+@contextmanager
+def watchlist_connection() -> Iterator[sqlite3.Connection]:
+    """
+    Borrow a pooled watchlist connection for the duration of a with block.
+
+    Reusing connections keeps their prepared statement caches warm. As with
+    a plain connection, the block's transaction is committed on success and
+    rolled back on an exception.
+
+    Parameters:
+        None
+    Returns:
+        Iterator[sqlite3.Connection]: The connection
+    """
+
+    pooled: PooledConnection = acquire_watchlist_connection()
+
+    try:
+        with pooled.connection:
+            yield pooled.connection
+    finally:
+        release_watchlist_connection(pooled)
+
 def get_shows() -> list[ArrowverseShow]:
     """
     Create a list of ArrowverseShow objects from the database.
@@ -59,7 +358,7 @@ def get_shows() -> list[ArrowverseShow]:
     """
 
     # Create a connection to the database
-    with sqlite3.connect('arrowverse.db') as conn:
+    with connect_catalog() as conn:
 
         # Create a cursor
         c: sqlite3.Cursor = conn.cursor()
@@ -74,7 +373,8 @@ def get_shows() -> list[ArrowverseShow]:
             Shows.Name,
             Shows.Image,
             Shows.BackgroundColor,
-            Shows.ForegroundColor
+            Shows.ForegroundColor,
+            Shows.ShowId
             From
             Shows
             """
@@ -88,7 +388,8 @@ def get_shows() -> list[ArrowverseShow]:
                 showname=row[0],
                 show_image=row[1],
                 background_color=row[2],
-                foreground_color=row[3]
+                foreground_color=row[3],
+                show_id=row[4]
             )
 
             # Add the ArrowverseShow object to the list
@@ -110,7 +411,7 @@ def get_list_of_episodes(watchlist_uuid: Union[str, None] = None) -> list[Arrowv
     arrowverse_shows: list[ArrowverseShowEpisode] = []
 
     # Create a connection to the database
-    with sqlite3.connect('arrowverse.db') as conn:
+    with connect_watchlists() as conn:
 
         # Create a cursor
         c: sqlite3.Cursor = conn.cursor()
@@ -127,18 +428,20 @@ def get_list_of_episodes(watchlist_uuid: Union[str, None] = None) -> list[Arrowv
             Episodes.AirDate,
             Episodes.Image,
             Shows.BackgroundColor,
-            Shows.ForegroundColor
-            FROM Shows
-            JOIN Seasons
+            Shows.ForegroundColor,
+            Shows.ShowId
+            FROM catalog.Shows AS Shows
+            JOIN catalog.Seasons AS Seasons
             ON Shows.ShowId = Seasons.ShowId
-            JOIN Episodes
+            JOIN catalog.Episodes AS Episodes
             ON Seasons.SeasonId = Episodes.SeasonId
-            ORDER BY Episodes.AirDate ASC
+            ORDER BY Episodes.AirDate ASC, Episodes.EpisodeId ASC
         """
+        parameters: tuple[Any, ...] = ()
 
         if type(watchlist_uuid) == str:
             # get the episode details like normal, but also get the watched status from the watchlist if it exists
-            query = f"""
+            query = """
                 SELECT 
                 Episodes.EpisodeId,
                 Shows.Name AS ShowName,
@@ -149,16 +452,17 @@ def get_list_of_episodes(watchlist_uuid: Union[str, None] = None) -> list[Arrowv
                 Episodes.Image,
                 Shows.BackgroundColor,
                 Shows.ForegroundColor,
+                Shows.ShowId,
                 CASE
                     WHEN WatchlistItems.Watched IS NOT NULL 
                     THEN WatchlistItems.Watched 
                     ELSE 0 
                     END 
                 AS Watched
-                FROM Episodes
-                JOIN Seasons
+                FROM catalog.Episodes AS Episodes
+                JOIN catalog.Seasons AS Seasons
                 ON Episodes.SeasonId = Seasons.SeasonId
-                JOIN Shows
+                JOIN catalog.Shows AS Shows
                 ON Seasons.ShowId = Shows.ShowId
                 LEFT JOIN
                 (
@@ -166,20 +470,21 @@ def get_list_of_episodes(watchlist_uuid: Union[str, None] = None) -> list[Arrowv
                     FROM WatchlistItems
                     JOIN Watchlists
                     ON WatchlistItems.WatchlistId = Watchlists.WatchlistId
-                    WHERE Watchlists.WatchlistUUID = '{watchlist_uuid}'
+                    WHERE Watchlists.WatchlistUUID = ?
                 ) AS WatchlistItems
                 ON Episodes.EpisodeId = WatchlistItems.EpisodeId
-                ORDER BY Episodes.AirDate ASC;
+                ORDER BY Episodes.AirDate ASC, Episodes.EpisodeId ASC;
                 """
+            parameters = (watchlist_uuid,)
 
         # Get all the episodes from the database
-        c.execute(query)
+        c.execute(query, parameters)
 
         # Loop through the results
         for row in c.fetchall():
 
             # Create an ArrowverseShow object
-            if len(row) == 9:  # if the watchlist_uuid is not provided, then the row will only have 9 columns
+            if len(row) == 10:  # if the watchlist_uuid is not provided, then the row will only have 10 columns
                 row = list(row)
                 row.append(0)  # add the watched status to the end of the row
                 row = tuple(row)
@@ -194,7 +499,8 @@ def get_list_of_episodes(watchlist_uuid: Union[str, None] = None) -> list[Arrowv
                 image=row[6],
                 background_color=row[7],
                 foreground_color=row[8],
-                watched=row[9]
+                show_id=row[9],
+                watched=row[10]
             )
 
             # Add the ArrowverseShow object to the list
@@ -203,252 +509,1513 @@ def get_list_of_episodes(watchlist_uuid: Union[str, None] = None) -> list[Arrowv
     # Return the list of ArrowverseShow objects
     return arrowverse_shows
 
-def get_watchlist_display_name(uuid: Union[str, None]) -> Union[str, None]:
+def get_catalog_version() -> str:
     """
-    Get the display name of a watchlist from the database.
+    Get the release version of the catalog database currently on disk.
 
     Parameters:
-        uuid (Union[str, None]): The uuid of the watchlist.
+        None
     Returns:
-        Union[str, None]: The display name of the watchlist or None if the watchlist does not exist.
+        str: The catalog version
     """
 
-    if type(uuid) != str:
-        return None
-
-    # Create a connection to the database
-    with sqlite3.connect('arrowverse.db') as conn:
+    with connect_catalog() as conn:
 
         # Create a cursor
         c: sqlite3.Cursor = conn.cursor()
 
-        c.execute("""
-            SELECT
-            DisplayName
-            FROM
-            Watchlists
-            Where
-            WatchlistUUID = ?
-        """, (uuid,))
+        c.execute("SELECT Version FROM CatalogVersion")
         result: Any = c.fetchone()
 
-        # check if the watchlist exists
-        if result is None:
-            return None
-
-        # get the display name
-        display_name: str = result[0]
-
-    return display_name
+    return result[0]
 
-def ensure_watchlist_exists(watchlist_uuid: str, watchlist_display_name: str) -> None:
+def load_catalog_cache() -> CatalogCache:
     """
-    Ensure that a watchlist exists in the database. If it does not exist, create it.
+    Load the catalog into this process and make it the current catalog cache.
+
+    Called at import time, so under gunicorn with preload_app the catalog is
+    loaded once in the master and shared copy-on-write with every worker.
 
     Parameters:
-        watchlist_uuid (str): The uuid of the watchlist.
-        watchlist_display_name (str): The display name of the watchlist.
-    Returns:
         None
+    Returns:
+        CatalogCache: The newly loaded catalog cache
     """
 
-    with sqlite3.connect('arrowverse.db') as conn:
-
-        # Create a cursor
-        c: sqlite3.Cursor = conn.cursor()
+    global catalog_cache
 
-        c.execute("""
-        SELECT
-        WatchlistId
-        FROM
-        Watchlists
-        WHERE
-        WatchlistUUID = ?
-        """, (watchlist_uuid, ))
+    # read the version first, a release swapped in mid-load is then picked up by the next check
+    loaded: CatalogCache = CatalogCache(
+        version=get_catalog_version(),
+        shows=get_shows(),
+        episodes=get_list_of_episodes()
+    )
 
-        result: Any = c.fetchone()
+    for episode in loaded.episodes:
+        loaded.episode_ids[(episode.showname, episode.season, episode.episode)] = episode.episode_id
+        loaded.episodes_by_id[episode.episode_id] = episode
 
-        if result:
-            return
+    loaded.viewing_order = get_viewing_order(loaded)
+    loaded.show_stylesheet = build_show_stylesheet(loaded.shows)
 
-        c.execute("""
-        INSERT
-        INTO Watchlists (
-            WatchlistUUID,
-            DisplayName
-        )
-        VALUES (
-            ?,
-            ?
-        )     
-        """, (
-            watchlist_uuid,
-            watchlist_display_name
-        ))
+    catalog_cache = loaded
 
-        conn.commit()
-    return
+    return loaded
 
-def get_watchlist_id(watchlist_uuid: str) -> int:
+def fingerprint_asset(name: str, content: bytes) -> StaticAsset:
     """
-    Get the id of a watchlist from the database.
+    Create a StaticAsset whose filename carries a hash of its content.
 
     Parameters:
-        watchlist_uuid (str): The uuid of the watchlist.
+        name (str): The asset path, e.g. "js/index.js"
+        content (bytes): The asset content
     Returns:
-        int: The id of the watchlist or -1 if the watchlist does not exist.
+        StaticAsset: The fingerprinted asset, e.g. "js/index.0123456789ab.js"
     """
 
-    with sqlite3.connect('arrowverse.db') as conn:
+    stem, extension = os.path.splitext(name)
+    digest: str = hashlib.sha256(content).hexdigest()[:12]
 
-        # Create a cursor
-        c: sqlite3.Cursor = conn.cursor()
+    return StaticAsset(
+        filename=f"{stem}.{digest}{extension}",
+        content=content,
+        mimetype=ASSET_MIMETYPES.get(extension, 'application/octet-stream')
+    )
 
-        c.execute("""
-            SELECT
-            WatchlistId
-            FROM
-            Watchlists
-            WHERE
-            WatchlistUUID = ?
-        """, (watchlist_uuid, ))
+def load_static_assets() -> dict[str, StaticAsset]:
+    """
+    Fingerprint every file in the static folder.
 
-        result: Any = c.fetchone()
+    Parameters:
+        None
+    Returns:
+        dict[str, StaticAsset]: The assets keyed by their unfingerprinted path
+    """
 
-        # check if the watchlist exists
-        if result is None:
-            return -1
+    assets: dict[str, StaticAsset] = {}
 
-        watchlist_id: int = result[0]
+    for directory, _, filenames in os.walk(app.static_folder):
+        for filename in filenames:
+            path: str = os.path.join(directory, filename)
+            name: str = os.path.relpath(path, app.static_folder).replace(os.sep, '/')
 
-        return watchlist_id
+            with open(path, 'rb') as f:
+                assets[name] = fingerprint_asset(name, f.read())
 
-def add_episodes(watchlist_uuid: str, watchlist_display_name: str, episode_watch_states: list[EpisodeWatchState]) -> None:
+    return assets
+
+def build_show_stylesheet(shows: list[ArrowverseShow]) -> StaticAsset:
     """
-    Add episodes to a watchlist.
+    Build the stylesheet with a show-<ShowId> class for each show's colours.
 
     Parameters:
-        watchlist_uuid (str): The uuid of the watchlist.
-        watchlist_display_name (str): The display name of the watchlist.
-        episode_watch_states (list[EpisodeWatchState]): A list of EpisodeWatchState objects.
+        shows (list[ArrowverseShow]): The shows
     Returns:
-        None
+        StaticAsset: The fingerprinted stylesheet
     """
-    # check if the watchlist exists
-    ensure_watchlist_exists(watchlist_uuid, watchlist_display_name)
 
-    # get the watchlist id
-    watchlist_id: int = get_watchlist_id(watchlist_uuid)
+    rules: list[str] = [
+        f".show-{show.show_id} {{ background-color: {show.background_color}; color: {show.foreground_color}; }}"
+        for show in shows
+    ]
 
-    if watchlist_id == -1:
-        return
+    return fingerprint_asset('css/shows.css', "\n".join(rules).encode('utf-8'))
 
-    with sqlite3.connect('arrowverse.db') as conn:
+def get_accept_encoding_qualities() -> dict[str, float]:
+    """
+    Parse the request's Accept-Encoding header into a quality per coding.
 
-        # Create a cursor
-        c: sqlite3.Cursor = conn.cursor()
+    Werkzeug's parsed header leaves out codings with q=0, which would make
+    a refused coding look merely unmentioned, so the raw header is read.
 
-        for episode_watch_state in episode_watch_states:
-            episode_id: int = episode_watch_state.episode_id
-            watched: int = episode_watch_state.watched
+    Parameters:
+        None
+    Returns:
+        dict[str, float]: The quality keyed by lowercase coding, including "*"
+    """
 
-            c.execute("""
-                SELECT
-                WatchlistItemId
-                FROM
-                WatchlistItems
-                WHERE
-                WatchlistId = ?
-                AND EpisodeId = ?
-            """, (watchlist_id, episode_id))
+    qualities: dict[str, float] = {}
 
-            result: Any = c.fetchall()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, parameters = item.partition(';')
+        coding = coding.strip().lower()
 
-            query: str = """
-                INSERT
-                INTO WatchlistItems (
-                    WatchlistId,
-                    EpisodeId,
-                    Watched
-                )
-                VALUES (
-                    :watchlist_id,
-                    :episode_id,
-                    :watched
-                )
-            """
+        if len(coding) == 0:
+            continue
 
-            if len(result) != 0:
-                query = """
-                    UPDATE
-                    WatchlistItems
-                    SET
-                    Watched = :watched
-                    WHERE
-                    WatchlistId = :watchlist_id
-                    AND EpisodeId = :episode_id
-                """
+        quality: float = 1.0
 
-            c.execute(query, {
-                "watchlist_id": watchlist_id,
-                "episode_id": episode_id,
-                "watched": watched
-            })
+        for parameter in parameters.split(';'):
+            name, _, value = parameter.partition('=')
 
-        conn.commit()
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
 
-def filter_arrowverse_items(
-    shows: list[Any],
-    allowed_shows: str
-) -> list[Any]:
+        qualities[coding] = quality
 
-    showname_map: dict[str, str] = {
-        'dclot': 'DC Legends of Tomorrow',
-        'tf': 'The Flash',
-        'a': 'Arrow',
-        'sg': 'Supergirl',
-        'bw': 'Batwoman',
-        'bl': 'Black Lightning',
-    }
+    return qualities
 
-    shownames_list: list[str] = allowed_shows.split(',')
+def choose_encoding() -> Union[str, None]:
+    """
+    Pick the supported encoding the client gives the highest quality.
 
-    shownames_list = [showname_map.get(showname, "N/a")
+    An encoding the client names takes its own quality, so q=0 refuses it
+    even alongside "*". Brotli wins a tie with gzip, as it compresses better.
+
+    Parameters:
+        None
+    Returns:
+        Union[str, None]: "br", "gzip" or None for an uncompressed response
+    """
+
+    supported: list[str] = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    qualities: dict[str, float] = get_accept_encoding_qualities()
+
+    best: Union[str, None] = None
+    best_quality: float = 0
+
+    for encoding in supported:
+        quality: float = qualities.get(encoding, qualities.get('*', 0))
+
+        if quality > best_quality:
+            best = encoding
+            best_quality = quality
+
+    return best
+
+def compress(content: bytes, encoding: str) -> bytes:
+    """
+    Compress a response body.
+
+    Parameters:
+        content (bytes): The body
+        encoding (str): "br" or "gzip"
+    Returns:
+        bytes: The compressed body
+    """
+
+    if encoding == 'br':
+        return brotli.compress(content, quality=5)
+
+    return gzip.compress(content, compresslevel=6)
+
+def compile_templates() -> None:
+    """
+    Compile every template ahead of its first render.
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+def prime_connections() -> None:
+    """
+    Fill the connection pool and prepare the hot statements on every connection.
+
+    Every connection is taken out of the pool, then each one is put back on
+    its own while the hot queries run, so it is the only idle connection
+    they can borrow. It is taken out again before the next one goes in.
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    unprimed: list[PooledConnection] = [
+        acquire_watchlist_connection()
+        for _ in range(WATCHLIST_POOL_SIZE)
+    ]
+    primed: list[PooledConnection] = []
+
+    for pooled in unprimed:
+        release_watchlist_connection(pooled)
+
+        get_watchlist_display_name(WARM_UP_WATCHLIST_UUID)
+        get_watchlist_id(WARM_UP_WATCHLIST_UUID)
+        get_watchlist_cache(WARM_UP_WATCHLIST_UUID)
+        invalidate_watchlist(WARM_UP_WATCHLIST_UUID)
+
+        primed.append(acquire_watchlist_connection())
+
+    for pooled in primed:
+        release_watchlist_connection(pooled)
+
+def warm_up() -> None:
+    """
+    Get this process ready to serve, then report ready on /ready.
+
+    Loads the catalog, compiles the templates, primes the connection pool
+    and serves the index once, with and without a watchlist, so the first
+    real requests after a deploy are not the slow ones. Run it in every
+    worker after forking, as connections cannot be shared across a fork.
+
+    Parameters:
+        None
+    Returns:
+        None
+    """
+
+    get_catalog()
+    compile_templates()
+    prime_connections()
+
+    client: Any = app.test_client()
+    client.get('/', headers={'Accept-Encoding': 'gzip'})
+    client.get(f'/?watchlist={WARM_UP_WATCHLIST_UUID}', headers={'Accept-Encoding': 'gzip'})
+
+    invalidate_watchlist(WARM_UP_WATCHLIST_UUID)
+
+    ready.set()
+
+def get_viewing_order(catalog: CatalogCache) -> list[int]:
+    """
+    Work out the order the whole catalog should be watched in.
+
+    Episodes are watched in air date order, except for the crossovers listed
+    in VIEWING_ORDER_FILENAME. The episodes of a crossover are put in the
+    listed order, using the places those same episodes had in air date
+    order, so nothing else moves. Episodes not in the catalog are ignored.
+
+    Parameters:
+        catalog (CatalogCache): The catalog, with episodes in air date order
+    Returns:
+        list[int]: Every episode id, in viewing order
+    """
+
+    viewing_order: list[int] = [episode.episode_id for episode in catalog.episodes]
+
+    if not os.path.exists(VIEWING_ORDER_FILENAME):
+        return viewing_order
+
+    with open(VIEWING_ORDER_FILENAME, 'r') as f:
+        overrides: Any = json.load(f)
+
+    positions: dict[int, int] = {
+        episode_id: position
+        for position, episode_id in enumerate(viewing_order)
+    }
+
+    for crossover in overrides.get('crossovers', []):
+
+        episode_ids: list[int] = [
+            catalog.episode_ids[(show, season, episode)]
+            for show, season, episode in crossover['episodes']
+            if (show, season, episode) in catalog.episode_ids
+        ]
+
+        slots: list[int] = sorted(positions[episode_id] for episode_id in episode_ids)
+
+        for slot, episode_id in zip(slots, episode_ids):
+            viewing_order[slot] = episode_id
+            positions[episode_id] = slot
+
+    return viewing_order
+
+def get_catalog() -> CatalogCache:
+    """
+    Get this process's catalog cache, loading it if needed.
+
+    Parameters:
+        None
+    Returns:
+        CatalogCache: The catalog cache
+    """
+
+    cache: Union[CatalogCache, None] = catalog_cache
+
+    if cache is None:
+        with cache_lock:
+            cache = catalog_cache or load_catalog_cache()
+
+    return cache
+
+def get_watchlist_data_version() -> int:
+    """
+    Get PRAGMA data_version for the watchlist database.
+
+    The value only changes when another connection, in this or any other
+    process, commits to the watchlist database. The monitor connection is
+    opened lazily per process, as SQLite connections must not cross a fork.
+
+    Parameters:
+        None
+    Returns:
+        int: The watchlist database data version
+    """
+
+    global watchlist_monitor, watchlist_monitor_pid
+
+    if watchlist_monitor is None or watchlist_monitor_pid != os.getpid():
+        watchlist_monitor = sqlite3.connect(WATCHLIST_DB_FILENAME, check_same_thread=False)
+        watchlist_monitor_pid = os.getpid()
+
+    return watchlist_monitor.execute("PRAGMA data_version").fetchone()[0]
+
+def get_changed_watchlists() -> Union[set[str], None]:
+    """
+    Get the uuids of the watchlists changed since the last call, by any process.
+
+    Every write to a watchlist is logged in WatchlistChanges, so only the
+    entries after the last one seen need reading. Call with cache_lock held.
+
+    Parameters:
+        None
+    Returns:
+        Union[set[str], None]: The changed uuids, or None if they cannot be told apart
+    """
+
+    global watchlist_change_id
+
+    # Create a cursor
+    c: sqlite3.Cursor = watchlist_monitor.cursor()
+
+    c.execute("""
+        SELECT
+        Watchlists.WatchlistUUID,
+        MAX(WatchlistChanges.ChangeId)
+        FROM
+        WatchlistChanges
+        JOIN Watchlists
+        ON WatchlistChanges.WatchlistId = Watchlists.WatchlistId
+        WHERE
+        WatchlistChanges.ChangeId > ?
+        GROUP BY WatchlistChanges.WatchlistId
+    """, (watchlist_change_id,))
+
+    rows: list[Any] = c.fetchall()
+
+    c.execute("SELECT COALESCE(MIN(ChangeId), 0) FROM WatchlistChanges")
+    oldest: int = c.fetchone()[0]
+
+    previous: int = watchlist_change_id
+    watchlist_change_id = max([previous] + [row[1] for row in rows])
+
+    # the first check in this process, or changes trimmed from the log before we saw them
+    if previous == -1 or oldest > previous + 1:
+        return None
+
+    return {row[0] for row in rows}
+
+def refresh_caches(force: bool = False) -> None:
+    """
+    Drop any cached state that is out of date with the databases.
+
+    The databases are checked at most once every CACHE_CHECK_INTERVAL
+    seconds, so every worker serves state that is at most that old. A new
+    catalog release reloads the catalog cache and clears the watchlist
+    caches. A commit to the watchlist database from any process only drops
+    the caches of the watchlists it changed.
+
+    Parameters:
+        force (bool, optional): Check regardless of the interval. Defaults to False.
+    Returns:
+        None
+    """
+
+    global last_cache_check, watchlist_data_version, watchlist_cache_generation
+
+    now: float = time.monotonic()
+
+    if not force and now - last_cache_check < CACHE_CHECK_INTERVAL:
+        return
+
+    with cache_lock:
+
+        # another thread checked while we waited for the lock
+        if not force and now - last_cache_check < CACHE_CHECK_INTERVAL:
+            return
+
+        last_cache_check = now
+
+        catalog_changed: bool = catalog_cache is None or catalog_cache.version != get_catalog_version()
+
+        if catalog_changed:
+            load_catalog_cache()
+
+        data_version: int = get_watchlist_data_version()
+
+        changed: Union[set[str], None] = set()
+
+        if data_version != watchlist_data_version:
+            changed = get_changed_watchlists()
+            watchlist_data_version = data_version
+
+        # next up positions index into the old catalog's viewing order
+        if catalog_changed or changed is None:
+            watchlist_caches.clear()
+            watchlist_cache_generation += 1
+        elif len(changed) != 0:
+            for watchlist_uuid in changed:
+                watchlist_caches.pop(watchlist_uuid, None)
+
+            watchlist_cache_generation += 1
+
+def invalidate_watchlist(watchlist_uuid: str) -> None:
+    """
+    Drop this process's cached state for a watchlist.
+
+    Other processes notice the change on their next refresh_caches() check.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+    Returns:
+        None
+    """
+
+    global watchlist_cache_generation
+
+    with cache_lock:
+        watchlist_caches.pop(watchlist_uuid, None)
+        watchlist_cache_generation += 1
+
+def get_watchlist_cache(watchlist_uuid: str) -> WatchlistCache:
+    """
+    Get this process's cached state for a watchlist, loading it if needed.
+
+    At most WATCHLIST_CACHE_SIZE watchlists are kept, the least recently
+    used are dropped first.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+    Returns:
+        WatchlistCache: The cached watchlist state
+    """
+
+    with cache_lock:
+        cache: Union[WatchlistCache, None] = watchlist_caches.get(watchlist_uuid)
+
+        if cache is not None:
+            watchlist_caches.move_to_end(watchlist_uuid)
+            return cache
+
+    # a save that lands while we read must not be overwritten by our older copy
+    generation: int = watchlist_cache_generation
+
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.execute("""
+            SELECT
+            WatchlistItems.EpisodeId,
+            WatchlistItems.Watched
+            FROM
+            WatchlistItems
+            JOIN Watchlists
+            ON WatchlistItems.WatchlistId = Watchlists.WatchlistId
+            WHERE
+            Watchlists.WatchlistUUID = ?
+        """, (watchlist_uuid,))
+
+        cache = WatchlistCache(watched={row[0]: row[1] for row in c.fetchall()})
+
+    with cache_lock:
+        if generation == watchlist_cache_generation:
+            watchlist_caches[watchlist_uuid] = cache
+
+            if len(watchlist_caches) > WATCHLIST_CACHE_SIZE:
+                watchlist_caches.popitem(last=False)
+
+    return cache
+
+def get_watched_episodes(watchlist_uuid: str) -> dict[int, int]:
+    """
+    Get the watched status of every episode saved to a watchlist.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+    Returns:
+        dict[int, int]: The watched status keyed by episode id
+    """
+
+    return get_watchlist_cache(watchlist_uuid).watched
+
+def get_next_up(watchlist_uuid: str, count: int) -> list[ArrowverseShowEpisode]:
+    """
+    Get the next unwatched episodes of a watchlist, in viewing order.
+
+    The position of the first unwatched episode is remembered until the
+    watchlist is next saved, so a lookup only walks the episodes it returns
+    plus any watched ones among them, not the whole catalog.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+        count (int): The number of episodes to return.
+    Returns:
+        list[ArrowverseShowEpisode]: Up to count unwatched episodes
+    """
+
+    catalog: CatalogCache = get_catalog()
+    cache: WatchlistCache = get_watchlist_cache(watchlist_uuid)
+
+    viewing_order: list[int] = catalog.viewing_order
+    watched: dict[int, int] = cache.watched
+
+    position: Union[int, None] = cache.next_up_position
+
+    if position is None:
+        position = 0
+
+        while position < len(viewing_order) and watched.get(viewing_order[position], 0) == 1:
+            position += 1
+
+        cache.next_up_position = position
+
+    next_up: list[ArrowverseShowEpisode] = []
+
+    while position < len(viewing_order) and len(next_up) < count:
+        episode_id: int = viewing_order[position]
+
+        if watched.get(episode_id, 0) != 1:
+            next_up.append(catalog.episodes_by_id[episode_id])
+
+        position += 1
+
+    return next_up
+
+def get_watchlist_episodes(watchlist_uuid: Union[str, None] = None) -> list[ArrowverseShowEpisode]:
+    """
+    Get the episode list for a watchlist from the caches.
+
+    Gives the same result as get_list_of_episodes(), without joining
+    against the catalog on every request.
+
+    Parameters:
+        watchlist_uuid (Union[str, None], optional): The watchlist uuid. Defaults to None.
+    Returns:
+        list[ArrowverseShowEpisode]: A list of ArrowverseShowEpisode objects
+    """
+
+    episodes: list[ArrowverseShowEpisode] = get_catalog().episodes
+
+    if type(watchlist_uuid) != str:
+        return list(episodes)
+
+    watched_episodes: dict[int, int] = get_watched_episodes(watchlist_uuid)
+
+    return [
+        replace(episode, watched=watched_episodes[episode.episode_id])
+        if episode.episode_id in watched_episodes
+        else episode
+        for episode in episodes
+    ]
+
+def get_watchlist_display_name(uuid: Union[str, None]) -> Union[str, None]:
+    """
+    Get the display name of a watchlist from the database.
+
+    Parameters:
+        uuid (Union[str, None]): The uuid of the watchlist.
+    Returns:
+        Union[str, None]: The display name of the watchlist or None if the watchlist does not exist.
+    """
+
+    if type(uuid) != str:
+        return None
+
+    # Create a connection to the database
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.execute("""
+            SELECT
+            DisplayName
+            FROM
+            Watchlists
+            Where
+            WatchlistUUID = ?
+        """, (uuid,))
+        result: Any = c.fetchone()
+
+        # check if the watchlist exists
+        if result is None:
+            return None
+
+        # get the display name
+        display_name: str = result[0]
+
+    return display_name
+
+def ensure_watchlist_exists(watchlist_uuid: str, watchlist_display_name: str) -> None:
+    """
+    Ensure that a watchlist exists in the database. If it does not exist, create it.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+        watchlist_display_name (str): The display name of the watchlist.
+    Returns:
+        None
+    """
+
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.execute("""
+        SELECT
+        WatchlistId
+        FROM
+        Watchlists
+        WHERE
+        WatchlistUUID = ?
+        """, (watchlist_uuid, ))
+
+        result: Any = c.fetchone()
+
+        if result:
+            return
+
+        c.execute("""
+        INSERT
+        INTO Watchlists (
+            WatchlistUUID,
+            DisplayName
+        )
+        VALUES (
+            ?,
+            ?
+        )     
+        """, (
+            watchlist_uuid,
+            watchlist_display_name
+        ))
+
+        conn.commit()
+    return
+
+def get_watchlist_id(watchlist_uuid: str) -> int:
+    """
+    Get the id of a watchlist from the database.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+    Returns:
+        int: The id of the watchlist or -1 if the watchlist does not exist.
+    """
+
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.execute("""
+            SELECT
+            WatchlistId
+            FROM
+            Watchlists
+            WHERE
+            WatchlistUUID = ?
+        """, (watchlist_uuid, ))
+
+        result: Any = c.fetchone()
+
+        # check if the watchlist exists
+        if result is None:
+            return -1
+
+        watchlist_id: int = result[0]
+
+        return watchlist_id
+
+def trim_change_log(c: sqlite3.Cursor) -> None:
+    """
+    Trim the change log to its last CHANGE_LOG_RETENTION entries.
+
+    Called in the transaction of every write that logs changes, so the log
+    is bounded whether or not anything subscribes to it. It only deletes
+    once the log is a tenth over the retention, not on every write.
+
+    Parameters:
+        c (sqlite3.Cursor): A cursor in the writing transaction
+    Returns:
+        None
+    """
+
+    c.execute("""
+        SELECT
+        (SELECT COALESCE(MIN(ChangeId), 0) FROM WatchlistChanges),
+        (SELECT COALESCE(MAX(ChangeId), 0) FROM WatchlistChanges)
+    """)
+
+    oldest, latest = c.fetchone()
+
+    if latest - oldest + 1 > CHANGE_LOG_RETENTION + CHANGE_LOG_RETENTION // 10:
+        c.execute("DELETE FROM WatchlistChanges WHERE ChangeId <= ?", (latest - CHANGE_LOG_RETENTION,))
+
+def add_episodes(watchlist_uuid: str, watchlist_display_name: str, episode_watch_states: list[EpisodeWatchState]) -> None:
+    """
+    Add episodes to a watchlist.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+        watchlist_display_name (str): The display name of the watchlist.
+        episode_watch_states (list[EpisodeWatchState]): A list of EpisodeWatchState objects.
+    Returns:
+        None
+    """
+    # check if the watchlist exists
+    ensure_watchlist_exists(watchlist_uuid, watchlist_display_name)
+
+    # get the watchlist id
+    watchlist_id: int = get_watchlist_id(watchlist_uuid)
+
+    if watchlist_id == -1:
+        return
+
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        for episode_watch_state in episode_watch_states:
+            episode_id: int = episode_watch_state.episode_id
+            watched: int = episode_watch_state.watched
+
+            c.execute("""
+                SELECT
+                WatchlistItemId
+                FROM
+                WatchlistItems
+                WHERE
+                WatchlistId = ?
+                AND EpisodeId = ?
+            """, (watchlist_id, episode_id))
+
+            result: Any = c.fetchall()
+
+            query: str = """
+                INSERT
+                INTO WatchlistItems (
+                    WatchlistId,
+                    EpisodeId,
+                    Watched
+                )
+                VALUES (
+                    :watchlist_id,
+                    :episode_id,
+                    :watched
+                )
+            """
+
+            if len(result) != 0:
+                query = """
+                    UPDATE
+                    WatchlistItems
+                    SET
+                    Watched = :watched
+                    WHERE
+                    WatchlistId = :watchlist_id
+                    AND EpisodeId = :episode_id
+                """
+
+            c.execute(query, {
+                "watchlist_id": watchlist_id,
+                "episode_id": episode_id,
+                "watched": watched
+            })
+
+        # log the changes in the same transaction, for the change feed
+        c.executemany("""
+            INSERT
+            INTO WatchlistChanges (
+                WatchlistId,
+                EpisodeId,
+                Watched
+            )
+            VALUES (
+                ?,
+                ?,
+                ?
+            )
+        """, [
+            (watchlist_id, episode_watch_state.episode_id, episode_watch_state.watched)
+            for episode_watch_state in episode_watch_states
+        ])
+
+        trim_change_log(c)
+
+        conn.commit()
+
+    invalidate_watchlist(watchlist_uuid)
+    change_notifier.wake()
+
+def set_watched_range(
+    watchlist_uuid: str,
+    watchlist_display_name: str,
+    watched: int,
+    showname: Union[str, None] = None,
+    season: Union[int, None] = None,
+    aired_before: Union[str, None] = None
+) -> int:
+    """
+    Set the watched status of every episode in a range in one statement.
+
+    The range is every episode matching all of the given filters, so with
+    no filters it is the whole catalog.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+        watchlist_display_name (str): The display name of the watchlist.
+        watched (int): The watched status to set.
+        showname (Union[str, None], optional): Only episodes of this show. Defaults to None.
+        season (Union[int, None], optional): Only episodes of this season. Defaults to None.
+        aired_before (Union[str, None], optional): Only episodes aired before this date. Defaults to None.
+    Returns:
+        int: The number of episodes set
+    """
+
+    # check if the watchlist exists
+    ensure_watchlist_exists(watchlist_uuid, watchlist_display_name)
+
+    # get the watchlist id
+    watchlist_id: int = get_watchlist_id(watchlist_uuid)
+
+    if watchlist_id == -1:
+        return 0
+
+    # the WHERE is always present, SQLite cannot otherwise tell ON CONFLICT from a join's ON
+    selection: str = """
+        SELECT
+        :watchlist_id,
+        Episodes.EpisodeId,
+        :watched
+        FROM catalog.Episodes AS Episodes
+        JOIN catalog.Seasons AS Seasons
+        ON Episodes.SeasonId = Seasons.SeasonId
+        JOIN catalog.Shows AS Shows
+        ON Seasons.ShowId = Shows.ShowId
+        WHERE 1
+    """
+
+    if showname is not None:
+        selection += " AND Shows.Name = :showname"
+
+    if season is not None:
+        selection += " AND Seasons.SeasonNumber = :season"
+
+    if aired_before is not None:
+        selection += " AND Episodes.AirDate < :aired_before"
+
+    query: str = """
+        INSERT
+        INTO WatchlistItems (
+            WatchlistId,
+            EpisodeId,
+            Watched
+        )
+    """ + selection + """
+        ON CONFLICT (WatchlistId, EpisodeId) DO UPDATE
+        SET Watched = excluded.Watched
+    """
+
+    parameters: dict[str, Any] = {
+        "watchlist_id": watchlist_id,
+        "watched": watched,
+        "showname": showname,
+        "season": season,
+        "aired_before": aired_before
+    }
+
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.execute(query, parameters)
+
+        updated: int = c.rowcount
+
+        # log the same range in the same transaction, for the change feed
+        c.execute("""
+            INSERT
+            INTO WatchlistChanges (
+                WatchlistId,
+                EpisodeId,
+                Watched
+            )
+        """ + selection, parameters)
+
+        trim_change_log(c)
+
+        conn.commit()
+
+    invalidate_watchlist(watchlist_uuid)
+    change_notifier.wake()
+
+    return updated
+
+def filter_arrowverse_items(
+    shows: list[Any],
+    allowed_shows: str
+) -> list[Any]:
+
+    shownames_list: list[str] = allowed_shows.split(',')
+
+    shownames_list = [SHOWNAME_MAP.get(showname, "N/a")
                       for showname in shownames_list]
     
     shownames_list = [showname for showname in shownames_list if showname != "N/a"]
 
-    if len(shownames_list) == 0:
-        return shows
+    if len(shownames_list) == 0:
+        return shows
+
+    return [
+        item
+        for item in shows
+        if item.showname in shownames_list
+    ]
+
+def iter_watchlist_records(watchlist_uuid: Union[str, None] = None) -> Iterator[WatchlistRecord]:
+    """
+    Stream the saved watch states of one or all watchlists.
+
+    Rows are fetched EXPORT_BATCH_SIZE at a time from a single read
+    transaction, so memory use does not grow with the number of watchlists.
+
+    Parameters:
+        watchlist_uuid (Union[str, None], optional): Only export this watchlist. Defaults to None.
+    Returns:
+        Iterator[WatchlistRecord]: The watch states
+    """
+
+    query: str = """
+        SELECT
+        Watchlists.WatchlistUUID,
+        Watchlists.DisplayName,
+        Shows.Name,
+        Seasons.SeasonNumber,
+        Episodes.EpisodeNumber,
+        WatchlistItems.Watched
+        FROM WatchlistItems
+        JOIN Watchlists
+        ON WatchlistItems.WatchlistId = Watchlists.WatchlistId
+        JOIN catalog.Episodes AS Episodes
+        ON WatchlistItems.EpisodeId = Episodes.EpisodeId
+        JOIN catalog.Seasons AS Seasons
+        ON Episodes.SeasonId = Seasons.SeasonId
+        JOIN catalog.Shows AS Shows
+        ON Seasons.ShowId = Shows.ShowId
+    """
+    parameters: tuple[Any, ...] = ()
+
+    if type(watchlist_uuid) == str:
+        query += " WHERE Watchlists.WatchlistUUID = ?"
+        parameters = (watchlist_uuid,)
+
+    query += " ORDER BY WatchlistItems.WatchlistId, WatchlistItems.EpisodeId"
+
+    conn: sqlite3.Connection = connect_watchlists()
+
+    try:
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.execute(query, parameters)
+
+        while True:
+            rows: list[Any] = c.fetchmany(EXPORT_BATCH_SIZE)
+
+            if len(rows) == 0:
+                break
+
+            for row in rows:
+                yield WatchlistRecord(
+                    watchlist_uuid=row[0],
+                    display_name=row[1],
+                    show=row[2],
+                    season=row[3],
+                    episode=row[4],
+                    watched=row[5]
+                )
+    finally:
+        conn.close()
+
+def format_watchlist_records(records: Iterator[WatchlistRecord], export_format: str) -> Iterator[str]:
+    """
+    Serialise watch states as NDJSON or CSV, a chunk of lines at a time.
+
+    Parameters:
+        records (Iterator[WatchlistRecord]): The watch states
+        export_format (str): Either "ndjson" or "csv"
+    Returns:
+        Iterator[str]: Chunks of the serialised output
+    """
+
+    buffer: io.StringIO = io.StringIO()
+    writer: Any = csv.writer(buffer, lineterminator="\n")
+
+    if export_format == "csv":
+        writer.writerow(EXPORT_FIELDS)
+
+    count: int = 0
+
+    for record in records:
+
+        if export_format == "csv":
+            writer.writerow([
+                record.watchlist_uuid,
+                record.display_name,
+                record.show,
+                record.season,
+                record.episode,
+                record.watched
+            ])
+        else:
+            buffer.write(json.dumps(record.__dict__, separators=(",", ":")))
+            buffer.write("\n")
+
+        count += 1
+
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+def parse_watchlist_record(raw: Any) -> WatchlistRecord:
+    """
+    Validate one imported row and turn it into a WatchlistRecord.
+
+    Parameters:
+        raw (Any): The decoded NDJSON object or CSV row
+    Returns:
+        WatchlistRecord: The watch state
+    Raises:
+        ValueError: If the row is not a valid watch state
+    """
+
+    if not isinstance(raw, dict):
+        raise ValueError("record is not an object")
+
+    watchlist_uuid: Any = raw.get("watchlist_uuid")
+
+    if type(watchlist_uuid) != str or len(watchlist_uuid) == 0:
+        raise ValueError("watchlist_uuid must be a non-empty string")
+
+    display_name: Any = raw.get("display_name")
+
+    if type(display_name) != str or len(display_name) == 0:
+        display_name = "My Watchlist"
+
+    show: Any = raw.get("show")
+
+    if type(show) != str:
+        raise ValueError("show must be a string")
+
+    season: Any = raw.get("season")
+    episode: Any = raw.get("episode")
+    watched: Any = raw.get("watched", 0)
+
+    # CSV values arrive as strings
+    if not str(season).isdigit() or not str(episode).isdigit():
+        raise ValueError("season and episode must be integers")
+
+    if str(watched) not in ["0", "1"]:
+        raise ValueError("watched must be 0 or 1")
+
+    return WatchlistRecord(
+        watchlist_uuid=watchlist_uuid,
+        display_name=display_name,
+        show=show,
+        season=int(season),
+        episode=int(episode),
+        watched=int(watched)
+    )
+
+def iter_import_rows(lines: Iterator[str], is_csv: bool) -> Iterator[Any]:
+    """
+    Decode an import body one row at a time.
+
+    Parameters:
+        lines (Iterator[str]): The lines of the body
+        is_csv (bool): Whether the body is CSV with a header row, otherwise NDJSON
+    Returns:
+        Iterator[Any]: The decoded rows, or a ValueError for a line that could not be decoded
+    """
+
+    if is_csv:
+        yield from csv.DictReader(lines)
+        return
+
+    for line in lines:
+
+        if len(line.strip()) == 0:
+            continue
+
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield ValueError("line is not valid JSON")
+
+def save_watchlist_records(records: list[WatchlistRecord], catalog: CatalogCache) -> None:
+    """
+    Upsert a batch of watch states in a single transaction.
+
+    Watchlists that do not exist yet are created with the record's display
+    name; existing watchlists keep theirs.
+
+    Parameters:
+        records (list[WatchlistRecord]): The watch states, all present in the catalog
+        catalog (CatalogCache): The catalog the records were validated against
+    Returns:
+        None
+    """
+
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.executemany("""
+            INSERT
+            INTO Watchlists (
+                WatchlistUUID,
+                DisplayName
+            )
+            VALUES (
+                ?,
+                ?
+            )
+            ON CONFLICT (WatchlistUUID) DO NOTHING
+        """, dict.fromkeys((record.watchlist_uuid, record.display_name) for record in records))
+
+        item_parameters: list[tuple[str, int, int]] = [
+            (
+                record.watchlist_uuid,
+                catalog.episode_ids[(record.show, record.season, record.episode)],
+                record.watched
+            )
+            for record in records
+        ]
+
+        c.executemany("""
+            INSERT
+            INTO WatchlistItems (
+                WatchlistId,
+                EpisodeId,
+                Watched
+            )
+            VALUES (
+                (SELECT WatchlistId FROM Watchlists WHERE WatchlistUUID = ?),
+                ?,
+                ?
+            )
+            ON CONFLICT (WatchlistId, EpisodeId) DO UPDATE
+            SET Watched = excluded.Watched
+        """, item_parameters)
+
+        # log the changes in the same transaction, for the change feed
+        c.executemany("""
+            INSERT
+            INTO WatchlistChanges (
+                WatchlistId,
+                EpisodeId,
+                Watched
+            )
+            VALUES (
+                (SELECT WatchlistId FROM Watchlists WHERE WatchlistUUID = ?),
+                ?,
+                ?
+            )
+        """, item_parameters)
+
+        trim_change_log(c)
+
+        conn.commit()
+
+    for watchlist_uuid in {record.watchlist_uuid for record in records}:
+        invalidate_watchlist(watchlist_uuid)
+
+    change_notifier.wake()
+
+def poll_watchlist_changes() -> dict[int, int]:
+    """
+    Find the watchlists changed since the last poll, by any process.
+
+    PRAGMA data_version is checked first, so the change log is only read
+    after a commit. Only called from the change notifier's thread.
+
+    Parameters:
+        None
+    Returns:
+        dict[int, int]: The latest change id keyed by watchlist id
+    """
+
+    global change_monitor, change_data_version, last_change_id
+
+    if change_monitor is None:
+        change_monitor = sqlite3.connect(WATCHLIST_DB_FILENAME)
+
+    data_version: int = change_monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    if data_version == change_data_version:
+        return {}
+
+    change_data_version = data_version
+
+    # Create a cursor
+    c: sqlite3.Cursor = change_monitor.cursor()
+
+    if last_change_id == -1:
+        c.execute("SELECT COALESCE(MAX(ChangeId), 0) FROM WatchlistChanges")
+        last_change_id = c.fetchone()[0]
+        return {}
+
+    c.execute("""
+        SELECT
+        WatchlistId,
+        MAX(ChangeId)
+        FROM
+        WatchlistChanges
+        WHERE
+        ChangeId > ?
+        GROUP BY WatchlistId
+    """, (last_change_id,))
+
+    changes: dict[int, int] = {row[0]: row[1] for row in c.fetchall()}
+
+    last_change_id = max([last_change_id] + list(changes.values()))
+
+    return changes
+
+def get_watchlist_changes(watchlist_id: int, after: int) -> list[tuple[int, int, int]]:
+    """
+    Get the logged changes to a watchlist after a change id, oldest first.
+
+    Parameters:
+        watchlist_id (int): The id of the watchlist.
+        after (int): The last change id already seen
+    Returns:
+        list[tuple[int, int, int]]: Up to CHANGE_BATCH_SIZE (change id, episode id, watched) rows
+    """
+
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.execute("""
+            SELECT
+            ChangeId,
+            EpisodeId,
+            Watched
+            FROM
+            WatchlistChanges
+            WHERE
+            WatchlistId = ?
+            AND ChangeId > ?
+            ORDER BY ChangeId
+            LIMIT ?
+        """, (watchlist_id, after, CHANGE_BATCH_SIZE))
+
+        return c.fetchall()
+
+def get_change_log_bounds(watchlist_id: int) -> tuple[int, int]:
+    """
+    Get the oldest change id still logged and the latest change id of a watchlist.
+
+    Parameters:
+        watchlist_id (int): The id of the watchlist.
+    Returns:
+        tuple[int, int]: The oldest logged change id and the watchlist's latest, 0 if none
+    """
+
+    with watchlist_connection() as conn:
+
+        # Create a cursor
+        c: sqlite3.Cursor = conn.cursor()
+
+        c.execute("""
+            SELECT
+            (SELECT COALESCE(MIN(ChangeId), 0) FROM WatchlistChanges),
+            (SELECT COALESCE(MAX(ChangeId), 0) FROM WatchlistChanges WHERE WatchlistId = ?)
+        """, (watchlist_id,))
+
+        result: Any = c.fetchone()
+
+    return result[0], result[1]
+
+def stream_watchlist_changes(watchlist_uuid: str, watchlist_id: int, after: int) -> Iterator[str]:
+    """
+    Stream a watchlist's changes as Server-Sent Events.
+
+    Each event carries the (episode_id, watched) pairs changed since the
+    previous one, with the latest state of an episode winning, and the
+    last change id as its id so a reconnecting client resumes from there.
+    Between changes the stream waits on change_notifier, sending a comment
+    every CHANGE_HEARTBEAT_SECONDS to notice clients that have gone.
+
+    A watchlist that still does not exist after CHANGE_UNKNOWN_WATCHLIST_SECONDS
+    ends the stream, so unknown uuids do not hold a thread for good. The
+    client is told to reconnect after as long again, with an id of 0 so it
+    then gets every change since the watchlist's creation.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+        watchlist_id (int): The id of the watchlist, or -1 if it does not exist yet
+        after (int): The last change id the client has seen
+    Returns:
+        Iterator[str]: The event stream
+    """
+
+    give_up_at: float = time.monotonic() + CHANGE_UNKNOWN_WATCHLIST_SECONDS
+
+    # a new watchlist is only created by its first save, look again after any change
+    while watchlist_id == -1:
+        seen: int = change_notifier.get_latest(ANY_WATCHLIST)
+        watchlist_id = get_watchlist_id(watchlist_uuid)
+
+        if watchlist_id != -1:
+            break
+
+        remaining: float = give_up_at - time.monotonic()
+
+        if remaining <= 0:
+            yield f"id: 0\nretry: {int(CHANGE_UNKNOWN_WATCHLIST_SECONDS * 1000)}\n\n"
+            return
+
+        if not change_notifier.wait(ANY_WATCHLIST, seen, min(CHANGE_HEARTBEAT_SECONDS, remaining)):
+            yield ": heartbeat\n\n"
+
+    while True:
+        changes: list[tuple[int, int, int]] = get_watchlist_changes(watchlist_id, after)
+
+        if len(changes) == 0:
+
+            if not change_notifier.wait(watchlist_id, after, CHANGE_HEARTBEAT_SECONDS):
+                yield ": heartbeat\n\n"
+
+            continue
 
-    return [
-        item
-        for item in shows
-        if item.showname in shownames_list
-    ]
+        watched_states: dict[int, int] = {}
 
-@app.route('/')
-def index():
+        for change_id, episode_id, watched in changes:
+            watched_states[episode_id] = watched
+            after = change_id
+
+        data: str = json.dumps(
+            [
+                {"episode_id": episode_id, "watched": watched}
+                for episode_id, watched in watched_states.items()
+            ],
+            separators=(",", ":")
+        )
+
+        yield f"id: {after}\ndata: {data}\n\n"
+
+# wakes the change feed subscribers of a watchlist when it changes
+change_notifier: ChangeNotifier = ChangeNotifier(poll_watchlist_changes, CHANGE_POLL_INTERVAL, app.logger)
+
+# fingerprinted files from the static folder
+static_assets: dict[str, StaticAsset] = load_static_assets()
+
+# load the catalog before any fork, see gunicorn.conf.py
+load_catalog_cache()
+
+@app.context_processor
+def inject_asset_urls() -> dict[str, Any]:
+    """
+    Make fingerprinted asset URLs available to templates.
+
+    Parameters:
+        None
+    Returns:
+        dict[str, Any]: The template globals
+    """
+
+    def asset_url(name: str) -> str:
+        return url_for('asset', filename=static_assets[name].filename)
+
+    return {
+        "asset_url": asset_url,
+        "show_stylesheet_url": url_for('asset', filename=get_catalog().show_stylesheet.filename)
+    }
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """
+    Compress a response when the client accepts gzip or brotli.
+
+    Streamed responses, such as exports, are left alone.
+
+    Parameters:
+        response (Response): The response
+    Returns:
+        Response: The possibly compressed response
     """
-    The index route.
+
+    if response.direct_passthrough or response.is_streamed:
+        return response
+
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    content: bytes = response.get_data()
+
+    if len(content) < COMPRESS_MIN_SIZE:
+        return response
+
+    encoding: Union[str, None] = choose_encoding()
+
+    if encoding is None:
+        return response
+
+    response.set_data(compress(content, encoding))
+    response.headers['Content-Encoding'] = encoding
+
+    return response
+
+@app.before_request
+def check_caches():
+    """
+    Bring this process's caches up to date before handling a request.
 
     Parameters:
         None
+    Returns:
+        None
+    """
+
+    refresh_caches()
+
+def render_index(watchlist_uuid: Union[str, None], shownames: Union[str, None]) -> str:
+    """
+    Render the index page.
+
+    Parameters:
+        watchlist_uuid (Union[str, None]): The watchlist uuid
+        shownames (Union[str, None]): The shownames filter
     Returns:
         str: The rendered template
     """
 
-    # Get the query parameters
-    shownames: Union[str, None] = request.args.get('shownames')
-    watchlist_uuid: Union[str, None] = request.args.get('watchlist')
     watchlist_display_name: Union[str, None] = get_watchlist_display_name(
         watchlist_uuid)
 
     # Create a list of ArrowverseShow objects
-    arrowverse_shows: list[ArrowverseShow] = get_shows()
+    arrowverse_shows: list[ArrowverseShow] = list(get_catalog().shows)
 
     # Create a list of ArrowverseShowEpisode objects
-    arrowverse_episodes: list[ArrowverseShowEpisode] = get_list_of_episodes(
+    arrowverse_episodes: list[ArrowverseShowEpisode] = get_watchlist_episodes(
         watchlist_uuid=watchlist_uuid)
 
     if type(shownames) == str:
@@ -476,6 +2043,79 @@ def index():
         episodes=arrowverse_episodes
     )
 
+def rate_limited(retry_after: float) -> tuple[Response, int, dict[str, str]]:
+    """
+    Build the response for a request refused by the rate limiter.
+
+    Parameters:
+        retry_after (float): The seconds until the request would be allowed
+    Returns:
+        tuple[Response, int, dict[str, str]]: The 429 response
+    """
+
+    return (
+        jsonify({"error": "too many requests for this watchlist"}),
+        429,
+        {'Retry-After': str(math.ceil(retry_after))}
+    )
+
+def flush_watchlist_save(watchlist_uuid: str, watchlist_display_name: str, states: dict[int, int]) -> None:
+    """
+    Commit the merged saves collected by save_debouncer.
+
+    Parameters:
+        watchlist_uuid (str): The uuid of the watchlist.
+        watchlist_display_name (str): The display name of the watchlist.
+        states (dict[int, int]): The watched status keyed by episode id
+    Returns:
+        None
+    """
+
+    add_episodes(watchlist_uuid, watchlist_display_name, [
+        EpisodeWatchState(episode_id=episode_id, watched=watched)
+        for episode_id, watched in states.items()
+    ])
+
+# identical index renders share one computation, rapid saves share one commit,
+# and no single watchlist gets more than its share of requests
+index_renders: SingleFlight = SingleFlight()
+save_debouncer: SaveDebouncer = SaveDebouncer(SAVE_DEBOUNCE_SECONDS, flush_watchlist_save)
+watchlist_limiter: RateLimiter = RateLimiter(RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+
+@app.route('/')
+def index():
+    """
+    The index route.
+
+    Concurrent requests for the same page share one render. A render only
+    joins one started after the last save it could have missed, as the
+    key includes the watchlist cache generation.
+
+    Parameters:
+        None
+    Returns:
+        str: The rendered template
+    """
+
+    # Get the query parameters
+    shownames: Union[str, None] = request.args.get('shownames')
+    watchlist_uuid: Union[str, None] = request.args.get('watchlist')
+
+    if type(watchlist_uuid) == str:
+        retry_after: float = watchlist_limiter.allow(watchlist_uuid)
+
+        if retry_after > 0:
+            return rate_limited(retry_after)
+
+    key: tuple[Any, ...] = (
+        watchlist_uuid,
+        shownames,
+        get_catalog().version,
+        watchlist_cache_generation
+    )
+
+    return index_renders.do(key, lambda: render_index(watchlist_uuid, shownames))
+
 @app.route('/save_watchlist', methods=['POST'])
 def save_watchlist():
     """
@@ -484,7 +2124,7 @@ def save_watchlist():
     Parameters:
         None
     Returns:
-        str: A redirect to the index route.
+        str: A redirect to the index route, or a 400 if an episode watch state is invalid.
     """
 
     json_data: Any = request.get_json()
@@ -506,6 +2146,11 @@ def save_watchlist():
 
     watchlist_uuid: str = json_data['watchlist_uuid']
 
+    retry_after: float = watchlist_limiter.allow(watchlist_uuid)
+
+    if retry_after > 0:
+        return rate_limited(retry_after)
+
     valid_display_name: bool = True
 
     # if the watchlist_display_name is not in the JSON payload
@@ -525,19 +2170,440 @@ def save_watchlist():
     if valid_display_name:
         watchlist_display_name: str = json_data['watchlist_display_name']
 
-    episode_watch_states: list[EpisodeWatchState] = []
+    # if the episode_watch_states is not a list
+    if type(json_data.get('episode_watch_states')) != list:
+        return jsonify({"error": "episode_watch_states must be a list"}), 400
+
+    episode_watch_states: dict[int, int] = {}
 
     # loop through episode_watch_states attribute in the JSON payload
     for episode_watch_state in json_data['episode_watch_states']:
-        state = EpisodeWatchState(
-            episode_id=episode_watch_state['episode_id'],
-            watched=episode_watch_state['watched']
-        )
-        episode_watch_states.append(state)
 
-    add_episodes(watchlist_uuid, watchlist_display_name, episode_watch_states)
+        # checked here, as one bad item would otherwise fail every save merged with it
+        if type(episode_watch_state) != dict:
+            return jsonify({"error": "each episode watch state must be an object"}), 400
+
+        episode_id: Any = episode_watch_state.get('episode_id')
+        watched: Any = episode_watch_state.get('watched')
+
+        # the page sends episode ids taken from element ids, as strings
+        if not str(episode_id).isdigit():
+            return jsonify({"error": "episode_id must be an integer"}), 400
+
+        if str(watched) not in ["0", "1"]:
+            return jsonify({"error": "watched must be 0 or 1"}), 400
+
+        episode_watch_states[int(episode_id)] = int(watched)
+
+    # merged with any other save to this watchlist arriving in the next SAVE_DEBOUNCE_SECONDS
+    save_debouncer.save(watchlist_uuid, watchlist_display_name, episode_watch_states)
 
     return redirect(url_for('index'))
 
+@app.route('/assets/<path:filename>')
+def asset(filename: str):
+    """
+    GET endpoint for a fingerprinted static asset.
+
+    The filename changes whenever the content does, so assets are cached
+    forever and their compressed bodies are only computed once.
+
+    Parameters:
+        filename (str): The fingerprinted asset path
+    Returns:
+        Response: The asset
+    """
+
+    assets: list[StaticAsset] = list(static_assets.values()) + [get_catalog().show_stylesheet]
+
+    found: Union[StaticAsset, None] = next(
+        (item for item in assets if item.filename == filename),
+        None
+    )
+
+    if found is None:
+        return jsonify({"error": "asset not found"}), 404
+
+    content: bytes = found.content
+    encoding: Union[str, None] = choose_encoding() if len(content) >= COMPRESS_MIN_SIZE else None
+
+    if encoding is not None:
+
+        if encoding not in found.compressed:
+            found.compressed[encoding] = compress(content, encoding)
+
+        content = found.compressed[encoding]
+
+    response: Response = Response(content, mimetype=found.mimetype)
+    response.headers['Cache-Control'] = ASSET_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+
+    return response
+
+@app.route('/ready')
+def readiness():
+    """
+    GET endpoint reporting whether this process has finished warming up.
+
+    Once ready, the process id and catalog version are included, so a
+    check can tell the workers apart and see which release each serves.
+
+    Parameters:
+        None
+    Returns:
+        Response: JSON, with status 503 until warm_up() has run
+    """
+
+    if not ready.is_set():
+        return jsonify({"ready": False}), 503
+
+    return jsonify({
+        "ready": True,
+        "pid": os.getpid(),
+        "catalog_version": get_catalog().version
+    })
+
+@app.route('/mark_watched', methods=['POST'])
+def mark_watched():
+    """
+    POST endpoint to set the watched status of a season, a show, or everything aired before a date.
+
+    JSON payload:
+        watchlist_uuid: The watchlist uuid.
+        watchlist_display_name: The display name, used if the watchlist is created.
+        watched: 1 or 0.
+        show: Optional show name or short code, as used by the shownames filter.
+        season: Optional season number, requires show.
+        aired_before: Optional date, YYYY-MM-DD.
+
+    Parameters:
+        None
+    Returns:
+        Response: JSON with the number of episodes set
+    """
+
+    json_data: Any = request.get_json(silent=True)
+
+    if not isinstance(json_data, dict):
+        return jsonify({"error": "a JSON object is required"}), 400
+
+    watchlist_uuid: Any = json_data.get('watchlist_uuid')
+
+    if type(watchlist_uuid) != str or len(watchlist_uuid) == 0:
+        return jsonify({"error": "watchlist_uuid must be a non-empty string"}), 400
+
+    retry_after: float = watchlist_limiter.allow(watchlist_uuid)
+
+    if retry_after > 0:
+        return rate_limited(retry_after)
+
+    watchlist_display_name: Any = json_data.get('watchlist_display_name')
+
+    if type(watchlist_display_name) != str or len(watchlist_display_name) == 0:
+        watchlist_display_name = "My Watchlist"
+
+    watched: Any = json_data.get('watched')
+
+    if watched not in [0, 1] or type(watched) == bool:
+        return jsonify({"error": "watched must be 0 or 1"}), 400
+
+    showname: Any = json_data.get('show')
+
+    if showname is not None:
+
+        if type(showname) != str:
+            return jsonify({"error": "show must be a string"}), 400
+
+        showname = SHOWNAME_MAP.get(showname, showname)
+
+        if showname not in [show.showname for show in get_catalog().shows]:
+            return jsonify({"error": "show is not in the catalog"}), 400
+
+    season: Any = json_data.get('season')
+
+    if season is not None:
+
+        if type(season) != int or showname is None:
+            return jsonify({"error": "season must be an integer and needs a show"}), 400
+
+    aired_before: Any = json_data.get('aired_before')
+
+    if aired_before is not None:
+
+        try:
+            aired_before = date.fromisoformat(aired_before).isoformat()
+        except (TypeError, ValueError):
+            return jsonify({"error": "aired_before must be a YYYY-MM-DD date"}), 400
+
+    updated: int = set_watched_range(
+        watchlist_uuid,
+        watchlist_display_name,
+        watched,
+        showname=showname,
+        season=season,
+        aired_before=aired_before
+    )
+
+    return jsonify({"updated": updated})
+
+@app.route('/watchlist_events')
+def watchlist_events():
+    """
+    GET endpoint streaming a watchlist's changes as Server-Sent Events.
+
+    A client reconnecting with Last-Event-ID gets everything it missed. If
+    the change log no longer reaches back that far it is sent a "reset"
+    event instead, and should reload the watchlist. A watchlist that does
+    not exist yet, such as a new one before its first save, gets an empty
+    stream that carries every change from its creation on.
+
+    Each worker holds at most MAX_CHANGE_STREAMS streams, leaving the rest
+    of its threads for other requests. Past that the client gets a 503
+    telling it to retry after CHANGE_STREAM_RETRY_SECONDS.
+
+    Query parameters:
+        watchlist: The watchlist uuid.
+        last_event_id: Used when there is no Last-Event-ID header, as a new EventSource cannot send one.
+
+    Parameters:
+        None
+    Returns:
+        Response: The event stream
+    """
+
+    watchlist_uuid: Union[str, None] = request.args.get('watchlist')
+
+    if type(watchlist_uuid) != str or len(watchlist_uuid) == 0:
+        return jsonify({"error": "watchlist is required"}), 400
+
+    if not change_stream_slots.acquire(blocking=False):
+        return Response(
+            f"retry: {CHANGE_STREAM_RETRY_SECONDS * 1000}\n\n",
+            status=503,
+            mimetype='text/event-stream',
+            headers={'Retry-After': str(CHANGE_STREAM_RETRY_SECONDS)}
+        )
+
+    after: int = 0
+    prefix: str = "retry: 2000\n\n"
+
+    try:
+        watchlist_id: int = get_watchlist_id(watchlist_uuid)
+
+        if watchlist_id != -1:
+            oldest, latest = get_change_log_bounds(watchlist_id)
+
+            last_event_id: str = request.headers.get('Last-Event-ID', request.args.get('last_event_id', ''))
+
+            after = latest
+
+            if last_event_id.isdigit():
+                after = int(last_event_id)
+
+                # changes after last_event_id may have been trimmed from the log
+                if after + 1 < oldest:
+                    after = latest
+                    prefix += f"id: {latest}\nevent: reset\ndata: {{}}\n\n"
+    except BaseException:
+        change_stream_slots.release()
+        raise
+
+    def generate() -> Iterator[str]:
+        yield prefix
+        yield from stream_watchlist_changes(watchlist_uuid, watchlist_id, after)
+
+    response: Response = Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+    # runs when the server closes the response, even if the stream never started
+    response.call_on_close(change_stream_slots.release)
+
+    return response
+
+@app.route('/next_up')
+def next_up():
+    """
+    GET endpoint for the next unwatched episodes of a watchlist, in viewing order.
+
+    Query parameters:
+        watchlist: The watchlist uuid.
+        count: The number of episodes to return, NEXT_UP_DEFAULT_COUNT by default.
+
+    Parameters:
+        None
+    Returns:
+        Response: JSON with the episodes
+    """
+
+    watchlist_uuid: Union[str, None] = request.args.get('watchlist')
+
+    if type(watchlist_uuid) != str or len(watchlist_uuid) == 0:
+        return jsonify({"error": "watchlist is required"}), 400
+
+    count: Any = request.args.get('count', str(NEXT_UP_DEFAULT_COUNT))
+
+    if not count.isdigit():
+        return jsonify({"error": "count must be a positive integer"}), 400
+
+    count = min(int(count), NEXT_UP_MAX_COUNT)
+
+    return jsonify({
+        "watchlist_uuid": watchlist_uuid,
+        "episodes": [
+            {
+                "episode_id": episode.episode_id,
+                "show": episode.showname,
+                "season": episode.season,
+                "episode": episode.episode,
+                "name": episode.name,
+                "airdate": episode.airdate,
+                "image": episode.image
+            }
+            for episode in get_next_up(watchlist_uuid, count)
+        ]
+    })
+
+def is_operator_request() -> bool:
+    """
+    Check whether the request carries the operator token.
+
+    A watchlist uuid is all it takes to read or change a watchlist, so
+    anything touching every watchlist needs the ARROWVERSE_ADMIN_TOKEN
+    bearer token instead. With no token configured, nobody is an operator.
+
+    Parameters:
+        None
+    Returns:
+        bool: Whether the request is from an operator
+    """
+
+    if len(ADMIN_TOKEN) == 0:
+        return False
+
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {ADMIN_TOKEN}")
+
+@app.route('/export_watchlists')
+def export_watchlists():
+    """
+    GET endpoint to stream watchlists as NDJSON or CSV.
+
+    Query parameters:
+        watchlist: The watchlist uuid to export. Only an operator may leave it out to export every watchlist.
+        format: "ndjson" (default) or "csv".
+
+    Parameters:
+        None
+    Returns:
+        Response: The streamed export
+    """
+
+    watchlist_uuid: Union[str, None] = request.args.get('watchlist')
+    export_format: str = request.args.get('format', 'ndjson')
+
+    if watchlist_uuid is not None and len(watchlist_uuid) == 0:
+        watchlist_uuid = None
+
+    if watchlist_uuid is None and not is_operator_request():
+        return jsonify({"error": "watchlist is required"}), 400
+
+    if export_format not in ['ndjson', 'csv']:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+
+    mimetype: str = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+
+    records: Iterator[WatchlistRecord] = iter_watchlist_records(watchlist_uuid)
+
+    return Response(
+        stream_with_context(format_watchlist_records(records, export_format)),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename=watchlists.{export_format}'
+        }
+    )
+
+@app.route('/import_watchlists', methods=['POST'])
+def import_watchlists():
+    """
+    POST endpoint to import watchlists from an NDJSON or CSV body.
+
+    The body is read line by line and saved IMPORT_BATCH_SIZE records per
+    transaction, so memory use is bounded however large the upload is. The
+    format is taken from the Content-Type, text/csv or NDJSON otherwise.
+    Invalid records are skipped and reported.
+
+    Query parameters:
+        watchlist: The watchlist uuid to import into, records for any other are rejected. Only an operator may leave it out to import every watchlist in the body.
+
+    Parameters:
+        None
+    Returns:
+        Response: JSON with the imported and rejected counts
+    """
+
+    watchlist_uuid: Union[str, None] = request.args.get('watchlist')
+
+    if watchlist_uuid is not None and len(watchlist_uuid) == 0:
+        watchlist_uuid = None
+
+    if watchlist_uuid is None and not is_operator_request():
+        return jsonify({"error": "watchlist is required"}), 400
+
+    catalog: CatalogCache = get_catalog()
+
+    lines: io.TextIOWrapper = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+
+    imported: int = 0
+    rejected: int = 0
+    errors: list[str] = []
+    batch: list[WatchlistRecord] = []
+
+    for record_number, raw in enumerate(iter_import_rows(lines, request.mimetype == 'text/csv'), start=1):
+
+        try:
+            if isinstance(raw, ValueError):
+                raise raw
+
+            record: WatchlistRecord = parse_watchlist_record(raw)
+
+            if watchlist_uuid is not None and record.watchlist_uuid != watchlist_uuid:
+                raise ValueError("record is for another watchlist")
+
+            if (record.show, record.season, record.episode) not in catalog.episode_ids:
+                raise ValueError("episode is not in the catalog")
+        except ValueError as e:
+            rejected += 1
+
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append(f"record {record_number}: {e}")
+
+            continue
+
+        batch.append(record)
+
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            save_watchlist_records(batch, catalog)
+            imported += len(batch)
+            batch = []
+
+    if len(batch) != 0:
+        save_watchlist_records(batch, catalog)
+        imported += len(batch)
+
+    return jsonify({
+        "imported": imported,
+        "rejected": rejected,
+        "errors": errors
+    })
+
 if __name__ == '__main__':
+    warm_up()
     app.run(debug=True)
@@ -0,0 +1,241 @@
+"""
+In-process request coalescing, save debouncing and rate limiting.
+"""
+
+# standard library full imports
+import threading
+import time
+
+# standard library partial imports
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Union
+
+@dataclass
+class InFlightCall:
+    """
+    The InFlightCall class represents a computation that other callers may wait on.
+    """
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Union[BaseException, None] = None
+
+@dataclass
+class PendingSave:
+    """
+    The PendingSave class represents the merged saves waiting to be committed for one key.
+    """
+    display_name: str
+    states: dict[int, int] = field(default_factory=dict)
+    done: threading.Event = field(default_factory=threading.Event)
+    error: Union[BaseException, None] = None
+
+@dataclass
+class TokenBucket:
+    """
+    The TokenBucket class represents the remaining request allowance of one key.
+    """
+    tokens: float
+    updated: float
+
+class SingleFlight:
+    """
+    The SingleFlight class runs one computation per key at a time.
+
+    Callers that ask for a key while it is already being computed wait for
+    that computation and share its result instead of starting their own.
+    """
+
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.calls: dict[Hashable, InFlightCall] = {}
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Any:
+        """
+        Run function for key, or wait for the run already in flight.
+
+        Parameters:
+            key (Hashable): Identifies calls that are interchangeable
+            function (Callable[[], Any]): The computation
+        Returns:
+            Any: The result of the computation
+        """
+
+        with self.lock:
+            call: Union[InFlightCall, None] = self.calls.get(key)
+            leader: bool = call is None
+
+            if call is None:
+                call = InFlightCall()
+                self.calls[key] = call
+
+        if not leader:
+            call.done.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # later callers start a fresh computation
+            with self.lock:
+                del self.calls[key]
+
+            call.done.set()
+
+        return call.result
+
+class SaveDebouncer:
+    """
+    The SaveDebouncer class merges saves to the same key that arrive close together.
+
+    The first save for a key waits delay seconds, collecting any further
+    saves for the same key, then commits them all with one call to flush.
+    Later states for an episode replace earlier ones. Every caller returns
+    once the commit holding its states has finished. Batches for the same
+    key are committed in the order they were started, so a later batch
+    never lands before an earlier one.
+    """
+
+    def __init__(self, delay: float, flush: Callable[[str, str, dict[int, int]], None]) -> None:
+        self.delay: float = delay
+        self.flush: Callable[[str, str, dict[int, int]], None] = flush
+        self.lock: threading.Lock = threading.Lock()
+        self.pending: dict[str, PendingSave] = {}
+        self.flushing: dict[str, PendingSave] = {}
+
+    def save(self, key: str, display_name: str, states: dict[int, int]) -> None:
+        """
+        Save states for key, merged with any other saves for it within the delay.
+
+        Parameters:
+            key (str): The key saves are merged by
+            display_name (str): The display name passed on to flush
+            states (dict[int, int]): The watched status keyed by episode id
+        Returns:
+            None
+        """
+
+        with self.lock:
+            pending: Union[PendingSave, None] = self.pending.get(key)
+            leader: bool = pending is None
+
+            if pending is None:
+                pending = PendingSave(display_name=display_name)
+                self.pending[key] = pending
+
+            pending.states.update(states)
+
+        if not leader:
+            pending.done.wait()
+
+            if pending.error is not None:
+                raise pending.error
+
+            return
+
+        time.sleep(self.delay)
+
+        # saves arriving from here on start the next batch, which commits after this one
+        with self.lock:
+            del self.pending[key]
+            previous: Union[PendingSave, None] = self.flushing.get(key)
+            self.flushing[key] = pending
+
+        if previous is not None:
+            previous.done.wait()
+
+        try:
+            self.flush(key, pending.display_name, pending.states)
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self.lock:
+                if self.flushing.get(key) is pending:
+                    del self.flushing[key]
+
+            pending.done.set()
+
+class RateLimiter:
+    """
+    The RateLimiter class keeps a token bucket per key.
+
+    Each bucket holds up to burst tokens and refills at rate tokens per
+    second. Full buckets are forgotten once more than max_keys are tracked,
+    as a full bucket is the same as no bucket. If none are full, the least
+    recently updated half are forgotten instead, so at most max_keys are
+    ever kept.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000) -> None:
+        self.rate: float = rate
+        self.burst: float = burst
+        self.max_keys: int = max_keys
+        self.lock: threading.Lock = threading.Lock()
+        self.buckets: dict[Hashable, TokenBucket] = {}
+
+    def allow(self, key: Hashable) -> float:
+        """
+        Take a token from key's bucket.
+
+        Parameters:
+            key (Hashable): The key to limit
+        Returns:
+            float: 0 if the request is allowed, otherwise the seconds until a token is available
+        """
+
+        now: float = time.monotonic()
+
+        with self.lock:
+            bucket: Union[TokenBucket, None] = self.buckets.get(key)
+
+            if bucket is None:
+                if len(self.buckets) >= self.max_keys:
+                    self.prune(now)
+
+                bucket = TokenBucket(tokens=self.burst, updated=now)
+                self.buckets[key] = bucket
+
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+
+            if bucket.tokens < 1:
+                return (1 - bucket.tokens) / self.rate
+
+            bucket.tokens -= 1
+
+        return 0
+
+    def prune(self, now: float) -> None:
+        """
+        Forget every bucket that has refilled completely, or failing that the
+        least recently updated half. Call with the lock held.
+
+        Parameters:
+            now (float): The current time.monotonic()
+        Returns:
+            None
+        """
+
+        self.buckets = {
+            key: bucket
+            for key, bucket in self.buckets.items()
+            if bucket.tokens + (now - bucket.updated) * self.rate < self.burst
+        }
+
+        if len(self.buckets) < self.max_keys:
+            return
+
+        # every bucket is partly drained, e.g. during a burst of new keys
+        by_age: list[tuple[Hashable, TokenBucket]] = sorted(
+            self.buckets.items(),
+            key=lambda item: item[1].updated
+        )
+
+        self.buckets = dict(by_age[len(by_age) - self.max_keys // 2:])